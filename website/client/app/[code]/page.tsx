@@ -1,5 +1,6 @@
-import { getVideos, getVideoByCode } from '@/lib/videos';
+import { getVideos, getVideoByCode, getSimilarVideos } from '@/lib/videos';
 import HlsPlayer from '@/components/HlsPlayer';
+import VideoCard from '@/components/VideoCard';
 import Link from 'next/link';
 
 // Required for static export
@@ -31,6 +32,8 @@ export default async function VideoPage({ params }: PageProps) {
     );
   }
 
+  const similarVideos = getSimilarVideos(video.id, 10);
+
   return (
     <div className="min-h-screen bg-primary text-white p-6">
       <div className="container mx-auto">
@@ -112,6 +115,17 @@ export default async function VideoPage({ params }: PageProps) {
              </div>
           </div>
         </div>
+
+        {similarVideos.length > 0 && (
+          <div className="mt-10">
+            <h2 className="text-xl font-semibold text-white mb-4">Similar Videos</h2>
+            <div className="grid grid-cols-1 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4 xl:grid-cols-5 gap-6">
+              {similarVideos.map((similar) => (
+                <VideoCard key={similar.code} video={similar} />
+              ))}
+            </div>
+          </div>
+        )}
       </div>
     </div>
   );
@@ -10,11 +10,11 @@ interface Actress {
 export default function ActressesPage() {
   const db = getDb();
   
+  // Counts come from actress_stats, maintained by the importer
   const actresses = db.prepare(`
-    SELECT a.id, a.name, COUNT(va.video_id) as videoCount
+    SELECT a.id, a.name, COALESCE(s.video_count, 0) as videoCount
     FROM actresses a
-    LEFT JOIN video_actresses va ON a.id = va.actress_id
-    GROUP BY a.id
+    LEFT JOIN actress_stats s ON a.id = s.actress_id
     ORDER BY videoCount DESC, a.name ASC
   `).all() as Actress[];
 
@@ -1,8 +1,10 @@
 import { getDb } from './db';
 import { Video } from './types';
 
-interface VideoRow {
-  id: number;
+// Rows of the video_summary table maintained by server/csv_to_sqlite.py.
+// Category lists are pre-joined and stored as JSON arrays.
+interface VideoSummaryRow {
+  video_id: number;
   video_code: string;
   video_url: string;
   m3u8_url: string;
@@ -13,63 +15,36 @@ interface VideoRow {
   label: string;
   description: string;
   thumbnail_url: string;
+  actresses: string;
+  genres: string;
+  makers: string;
 }
 
-interface CategoryRow {
-  name: string;
-}
-
-function buildVideoWithCategories(videoRow: VideoRow): Video {
-  const db = getDb();
-  
-  // Get actresses for this video
-  const actresses = db.prepare(`
-    SELECT a.name 
-    FROM video_actresses va
-    JOIN actresses a ON va.actress_id = a.id
-    WHERE va.video_id = ?
-  `).all(videoRow.id) as CategoryRow[];
-  
-  // Get genres for this video
-  const genres = db.prepare(`
-    SELECT g.name 
-    FROM video_genres vg
-    JOIN genres g ON vg.genre_id = g.id
-    WHERE vg.video_id = ?
-  `).all(videoRow.id) as CategoryRow[];
-  
-  // Get makers for this video
-  const makers = db.prepare(`
-    SELECT m.name 
-    FROM video_makers vm
-    JOIN makers m ON vm.maker_id = m.id
-    WHERE vm.video_id = ?
-  `).all(videoRow.id) as CategoryRow[];
-  
+function buildVideoFromSummary(row: VideoSummaryRow): Video {
   return {
-    id: videoRow.id,
-    code: videoRow.video_code,
-    videoUrl: videoRow.video_url,
-    m3u8Url: videoRow.m3u8_url,
-    quality: videoRow.quality,
-    title: videoRow.title,
-    releaseDate: videoRow.release_date,
-    actresses: actresses.map(a => a.name),
-    genres: genres.map(g => g.name),
-    makers: makers.map(m => m.name),
-    director: videoRow.director,
-    label: videoRow.label,
-    description: videoRow.description,
-    thumbnailUrl: videoRow.thumbnail_url,
+    id: row.video_id,
+    code: row.video_code,
+    videoUrl: row.video_url,
+    m3u8Url: row.m3u8_url,
+    quality: row.quality,
+    title: row.title,
+    releaseDate: row.release_date,
+    actresses: JSON.parse(row.actresses) as string[],
+    genres: JSON.parse(row.genres) as string[],
+    makers: JSON.parse(row.makers) as string[],
+    director: row.director,
+    label: row.label,
+    description: row.description,
+    thumbnailUrl: row.thumbnail_url,
   };
 }
 
 export function getVideos(): Video[] {
   try {
     const db = getDb();
-    const videoRows = db.prepare('SELECT * FROM videos ORDER BY release_date DESC').all() as VideoRow[];
+    const rows = db.prepare('SELECT * FROM video_summary ORDER BY release_date DESC').all() as VideoSummaryRow[];
     
-    return videoRows.map(buildVideoWithCategories);
+    return rows.map(buildVideoFromSummary);
   } catch (error) {
     console.error('Error reading from database:', error);
     return [];
@@ -79,13 +54,34 @@ export function getVideos(): Video[] {
 export function getVideoByCode(code: string): Video | undefined {
   try {
     const db = getDb();
-    const videoRow = db.prepare('SELECT * FROM videos WHERE video_code = ?').get(code) as VideoRow | undefined;
+    const row = db.prepare('SELECT * FROM video_summary WHERE video_code = ?').get(code) as VideoSummaryRow | undefined;
     
-    if (!videoRow) return undefined;
+    if (!row) return undefined;
     
-    return buildVideoWithCategories(videoRow);
+    return buildVideoFromSummary(row);
   } catch (error) {
     console.error('Error reading video from database:', error);
     return undefined;
   }
 }
+
+// Precomputed neighbours from the video_similar table (server/build_similar.py):
+// one primary-key range read, ordered by rank.
+export function getSimilarVideos(videoId: number, limit = 10): Video[] {
+  try {
+    const db = getDb();
+    const rows = db.prepare(`
+      SELECT s.* FROM video_similar vs
+      JOIN video_summary s ON s.video_id = vs.similar_id
+      WHERE vs.video_id = ?
+      ORDER BY vs.rank
+      LIMIT ?
+    `).all(videoId, limit) as VideoSummaryRow[];
+
+    return rows.map(buildVideoFromSummary);
+  } catch (error) {
+    // Databases built before video_similar existed have no recommendations
+    console.error('Error reading similar videos from database:', error);
+    return [];
+  }
+}
@@ -0,0 +1,215 @@
+import argparse
+import io
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+from categories import CATEGORY_KINDS
+from csv_to_sqlite import import_csv_to_db
+from export_to_json import export_db_to_json
+from generate_catalog import CATALOG_SIZES, generate_catalog, parse_size
+from video_repository import VideoRepository
+
+# Times each query is run; the median and the fastest run are reported
+QUERY_REPEATS = 5
+
+
+def current_commit():
+    """Short hash of the checked out commit, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(function, *args, **kwargs):
+    """Run function quietly; return (seconds, result, error message)."""
+    start = time.perf_counter()
+    try:
+        # The importer and exporter report progress on stdout
+        with redirect_stdout(io.StringIO()):
+            result = function(*args, **kwargs)
+        error = None
+    except Exception as e:
+        result, error = None, f'{type(e).__name__}: {e}'
+    return round(time.perf_counter() - start, 4), result, error
+
+
+def sample_names(db_path):
+    """Pick query arguments that exist in the catalog: a code and the busiest names."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    code = cursor.execute('SELECT video_code FROM videos ORDER BY id LIMIT 1').fetchone()[0]
+    names = {}
+    for table, junction, column, _ in CATEGORY_KINDS.values():
+        names[table] = cursor.execute(f'''
+            SELECT c.name FROM {table} c
+            JOIN {junction} j ON j.{column} = c.id
+            GROUP BY c.id
+            ORDER BY COUNT(*) DESC
+            LIMIT 1
+        ''').fetchone()[0]
+    conn.close()
+    return code, names
+
+
+def raw_query(sql):
+    def run(repository):
+        with repository.connection() as conn:
+            return conn.execute(sql).fetchall()
+    return run
+
+
+def benchmark_queries(db_path):
+    """Time the representative queries of csv_to_sqlite.query_examples, uncached."""
+    code, names = sample_names(db_path)
+    queries = {
+        'by_code': lambda r: r.by_code(code),
+        'top_actresses': lambda r: r.top_categories('actress', 5),
+        'by_actress': lambda r: r.by_actress(names['actresses'], limit=3),
+        'filter_genre_maker': lambda r: r.filter(genres=[names['genres']],
+                                                 makers=[names['makers']], limit=3),
+        'top_genres': lambda r: r.top_categories('genre', 5),
+        'by_resolution': raw_query('''
+            SELECT height, width, COUNT(*) FROM videos
+            WHERE height IS NOT NULL GROUP BY height, width
+        '''),
+        'by_cdn_host': raw_query('''
+            SELECT cdn_host, COUNT(*) FROM videos
+            WHERE cdn_host IS NOT NULL GROUP BY cdn_host
+        '''),
+        'search': lambda r: r.search('creampie', limit=3),
+        'recent_page': lambda r: r.page(limit=20),
+    }
+    
+    results = {}
+    with VideoRepository(db_path, pool_size=1) as repository:
+        for name, query in queries.items():
+            runs = []
+            for _ in range(QUERY_REPEATS):
+                # Measure the database, not the repository's result cache
+                repository.clear_cache()
+                start = time.perf_counter()
+                query(repository)
+                runs.append(time.perf_counter() - start)
+            results[name] = {
+                'median_ms': round(statistics.median(runs) * 1000, 3),
+                'min_ms': round(min(runs) * 1000, 3),
+            }
+    return results
+
+
+def benchmark_size(rows, data_dir, seed=0, bulk=False):
+    """Generate (or reuse) a catalog of `rows` videos and time import, export and queries."""
+    csv_path = data_dir / f'synthetic_{rows}_{seed}.csv'
+    db_path = data_dir / f'synthetic_{rows}.db'
+    json_path = data_dir / f'synthetic_{rows}.json'
+    
+    result = {'rows': rows}
+    if not csv_path.exists():
+        result['generate_seconds'], _, _ = timed(generate_catalog, csv_path, rows, seed)
+    
+    for name, incremental in (('import', False), ('reimport_unchanged', True)):
+        seconds, report, error = timed(
+            import_csv_to_db, str(csv_path), str(db_path),
+            incremental=incremental, bulk_session=bulk, report=False
+        )
+        result[name] = {'seconds': seconds, 'error': error}
+        if report:
+            result[name]['rows_per_second'] = report['rows_per_second']
+            result[name]['peak_memory_bytes'] = report['peak_memory_bytes']
+            result[name]['phases'] = report['phases']
+    result['database_bytes'] = db_path.stat().st_size if db_path.exists() else None
+    
+    seconds, exported, error = timed(export_db_to_json, str(db_path), str(json_path))
+    result['export'] = {'seconds': seconds, 'videos': exported, 'error': error}
+    if json_path.exists() and not error:
+        result['export']['bytes'] = json_path.stat().st_size
+    
+    if not result['import']['error']:
+        result['queries'] = benchmark_queries(str(db_path))
+    return result
+
+
+def print_results(results):
+    for size in results['sizes']:
+        print(f"{size['rows']} rows:")
+        for step in ('import', 'reimport_unchanged', 'export'):
+            entry = size[step]
+            status = f"failed ({entry['error']})" if entry['error'] else f"{entry['seconds']:.3f}s"
+            print(f"  {step:<20} {status}")
+        for name, timing in size.get('queries', {}).items():
+            print(f"  {name:<20} {timing['median_ms']:.3f} ms")
+
+
+def compare_results(baseline, results):
+    """Print current/baseline time ratios for every step both runs share."""
+    baseline_sizes = {size['rows']: size for size in baseline['sizes']}
+    print(f"Compared with {baseline.get('commit') or 'baseline'} (current / baseline):")
+    for size in results['sizes']:
+        before = baseline_sizes.get(size['rows'])
+        if not before:
+            continue
+        pairs = [
+            (step, size[step]['seconds'], before[step]['seconds'])
+            for step in ('import', 'reimport_unchanged', 'export')
+            if step in before and not size[step]['error'] and not before[step]['error']
+        ]
+        pairs += [
+            (name, timing['median_ms'], before['queries'][name]['median_ms'])
+            for name, timing in size.get('queries', {}).items()
+            if name in before.get('queries', {})
+        ]
+        print(f"{size['rows']} rows:")
+        for name, now, then in pairs:
+            print(f"  {name:<20} {now / then if then else float('inf'):.2f}x")
+
+
+def run_benchmarks(sizes, data_dir='benchmark_data', seed=0, bulk=False):
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    return {
+        'commit': current_commit(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.machine(),
+        'seed': seed,
+        'bulk_session': bulk,
+        'sizes': [benchmark_size(rows, data_dir, seed, bulk) for rows in sizes],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark import, export and queries on synthetic catalogs")
+    parser.add_argument("sizes", nargs="*", type=parse_size, default=[CATALOG_SIZES['10k']],
+                        help="row counts or presets: " + ", ".join(CATALOG_SIZES))
+    parser.add_argument("--data-dir", default="benchmark_data",
+                        help="where generated CSVs and databases are kept between runs")
+    parser.add_argument("--output", default=None,
+                        help="results JSON (default: benchmark-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bulk", action="store_true", help="import in a bulk session")
+    args = parser.parse_args()
+    
+    results = run_benchmarks(args.sizes, args.data_dir, args.seed, args.bulk)
+    print_results(results)
+    
+    output_path = args.output or f"benchmark-{results['commit'] or 'local'}.json"
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to: {output_path}")
+    
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare_results(json.load(f), results)
@@ -0,0 +1,185 @@
+import argparse
+import heapq
+import math
+import time
+from array import array
+from itertools import accumulate, repeat
+
+from csv_to_sqlite import create_database
+from facet_index import FACET_KINDS, FacetIndex
+
+# Neighbours stored per video
+TOP_K = 10
+
+# Videos scored per video at most. They are scored in order of the best
+# score they could reach, so past this many the ones left out are those
+# least able to make the top k
+MAX_CANDIDATES = 2000
+
+# Sharing an actress says more than sharing a maker, and much more than
+# sharing a genre; each tag's weight is this times its inverse document frequency
+KIND_WEIGHTS = {'actress': 3.0, 'maker': 1.5, 'genre': 1.0}
+
+METRICS = ('cosine', 'jaccard')
+
+# Rows written per executemany call
+WRITE_BATCH = 10000
+
+
+def tag_weights(index):
+    """Weight of every (kind, category id) tag: kind weight x idf."""
+    total = max(1, len(index.video_ids))
+    return {
+        (kind, category_id): KIND_WEIGHTS[kind] * math.log(1 + total / len(ids))
+        for kind, postings in index.postings.items()
+        for category_id, ids in postings.items()
+    }
+
+
+def video_tags(index, video_id):
+    return [
+        (kind, category_id)
+        for kind in FACET_KINDS
+        for category_id in index.links_of(kind, video_id)
+    ]
+
+
+def similarity(metric, shared, norm, other_norm):
+    """Score of two videos whose shared tags add up to shared."""
+    if metric == 'cosine':
+        return shared / (norm * other_norm)
+    return shared / (norm + other_norm - shared)
+
+
+def norm_order(index, tag, norms, orders):
+    """Ids of the videos carrying a tag, smallest norm first, cached in orders."""
+    order = orders.get(tag)
+    if order is None:
+        order = orders[tag] = array('I', sorted(index.postings[tag[0]][tag[1]], key=norms.__getitem__))
+    return order
+
+
+def bounded(index, tag, shared, norm, norms, metric, orders):
+    """(score bound, video id) for the videos carrying a tag, highest bound
+    first: the best score each could reach against a video of norm norm
+    when the tags they share add up to at most shared."""
+    order = norm_order(index, tag, norms, orders)
+    if metric == 'cosine':
+        # The shared part of a tag vector is no longer than the whole vector
+        ceiling = math.sqrt(shared) / norm
+        return ((min(ceiling, shared / (norm * norms[candidate])), candidate) for candidate in order)
+    # A video shares at most its own norm
+    return ((shared / (norm + max(norms[candidate] - shared, 0.0)), candidate) for candidate in order)
+
+
+def neighbours(index, video_id, tags_by_video, weights, norms, metric, orders, top_k=TOP_K):
+    """Top-k (score, similar video id) pairs for one video, best first.
+
+    A video first met through one of this video's tags shares at most that
+    tag and the lighter ones, which bounds its score. Videos are scored in
+    order of that bound, highest first, until no bound left can beat the
+    k-th best score, so the result is exact unless more than
+    MAX_CANDIDATES videos could; then it is the top k of the
+    MAX_CANDIDATES videos with the highest bounds.
+    """
+    norm = norms[video_id]
+    contributions = {
+        tag: weights[tag] ** 2 if metric == 'cosine' else weights[tag]
+        for tag in tags_by_video[video_id]
+    }
+    ordered = sorted(contributions, key=contributions.get, reverse=True)
+    # What the tags from each position on can still add to a shared score
+    remaining = list(accumulate(contributions[tag] for tag in reversed(ordered)))[::-1]
+    streams = [
+        bounded(index, tag, left, norm, norms, metric, orders)
+        for tag, left in zip(ordered, remaining)
+    ]
+    
+    # The best k so far as (score, -video id), worst first; once there are
+    # k, a video has to score above the worst of them to get in
+    best = []
+    threshold = -1.0
+    scored = {video_id}
+    for bound, candidate in heapq.merge(*streams, reverse=True):
+        if bound <= threshold or len(scored) > MAX_CANDIDATES:
+            break
+        if candidate in scored:
+            continue
+        scored.add(candidate)
+        shared = sum(map(contributions.get, tags_by_video[candidate], repeat(0.0)))
+        entry = (similarity(metric, shared, norm, norms[candidate]), -candidate)
+        if len(best) < top_k:
+            heapq.heappush(best, entry)
+            if len(best) == top_k:
+                threshold = best[0][0]
+        elif entry > best[0]:
+            heapq.heapreplace(best, entry)
+            threshold = best[0][0]
+    
+    return [(score, -negated) for score, negated in sorted(best, reverse=True)]
+
+
+def build_similar(db_path='videos.db', metric='cosine', top_k=TOP_K):
+    """Recompute the video_similar table for every video.
+
+    Videos are compared by their actresses, makers and genres, weighted by
+    KIND_WEIGHTS and tag rarity, with cosine or weighted Jaccard similarity.
+    Returns the number of rows written.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}, expected one of {METRICS}")
+    
+    started = time.perf_counter()
+    index = FacetIndex(db_path)
+    weights = tag_weights(index)
+    loaded = time.perf_counter()
+    
+    # Norm of each video's weighted tag vector, indexed by video id
+    video_ids = list(index.video_ids)
+    norms = array('d', bytes(8 * (max(video_ids, default=0) + 1)))
+    tags_by_video = {}
+    for video_id in video_ids:
+        tags = tags_by_video[video_id] = video_tags(index, video_id)
+        if metric == 'cosine':
+            norms[video_id] = math.sqrt(sum(weights[tag] ** 2 for tag in tags))
+        else:
+            norms[video_id] = sum(weights[tag] for tag in tags)
+    
+    conn = create_database(db_path, rebuild=False)
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM video_similar')
+    
+    rows = []
+    written = 0
+    orders = {}
+    for video_id in video_ids:
+        if not tags_by_video[video_id]:
+            continue
+        for rank, (score, similar_id) in enumerate(
+            neighbours(index, video_id, tags_by_video, weights, norms, metric, orders, top_k), 1
+        ):
+            rows.append((video_id, rank, similar_id, round(score, 6)))
+        if len(rows) >= WRITE_BATCH:
+            cursor.executemany('INSERT INTO video_similar VALUES (?, ?, ?, ?)', rows)
+            written += len(rows)
+            rows = []
+    cursor.executemany('INSERT INTO video_similar VALUES (?, ?, ?, ?)', rows)
+    written += len(rows)
+    conn.commit()
+    conn.close()
+    index.close()
+    
+    finished = time.perf_counter()
+    print(f"Computed {written} similar-video rows for {len(video_ids)} videos ({metric})")
+    print(f"  Index load: {loaded - started:.1f}s, similarity: {finished - loaded:.1f}s")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute similar videos from shared actresses, makers and genres")
+    parser.add_argument("--db", dest="db_file", default="videos.db")
+    parser.add_argument("--metric", choices=METRICS, default="cosine")
+    parser.add_argument("--top", type=int, default=TOP_K, help="neighbours kept per video")
+    args = parser.parse_args()
+    
+    build_similar(args.db_file, args.metric, args.top)
@@ -0,0 +1,219 @@
+import argparse
+import json
+import sqlite3
+import time
+from array import array
+from bisect import bisect_left
+
+from categories import ALIASED_KINDS, CATEGORY_KINDS
+from columnar_file import SectionFile, StringDictionary, write_sections
+
+SNAPSHOT_MAGIC = b'VLSNAP\x00\x01'
+SNAPSHOT_VERSION = 1
+
+# Text columns, stored as ids into the string dictionary (0 = NULL)
+TEXT_COLUMNS = (
+    'video_code', 'video_url', 'm3u8_url', 'quality', 'title', 'release_date',
+    'director', 'label', 'description', 'thumbnail_url',
+)
+
+# Category kind -> (video_summary column, category table, names to look up).
+# video_summary names its category columns after the category tables, and
+# the lookup source includes merged spellings for kinds that have aliases.
+SNAPSHOT_KINDS = {
+    kind: (table, table, ALIASED_KINDS[kind][1] if kind in ALIASED_KINDS else table)
+    for kind, (table, _, _, _) in CATEGORY_KINDS.items()
+}
+
+
+def utf8(value):
+    return value.encode('utf-8')
+
+
+def invert(offsets, links, size):
+    """Turn row -> values offset arrays into value -> rows, rows ascending."""
+    counts = array('I', bytes(4 * size))
+    for value in links:
+        counts[value] += 1
+    posting_offsets = array('I', [0])
+    total = 0
+    for count in counts:
+        total += count
+        posting_offsets.append(total)
+    
+    postings = array('I', bytes(4 * len(links)))
+    fill = array('I', posting_offsets[:-1])
+    for row in range(len(offsets) - 1):
+        for value in links[offsets[row]:offsets[row + 1]]:
+            postings[fill[value]] = row
+            fill[value] += 1
+    return posting_offsets, postings
+
+
+def lookup_entries(conn, kind):
+    """(name or alias, canonical name) pairs for one kind."""
+    _, table, lookup = SNAPSHOT_KINDS[kind]
+    return conn.execute(f'''
+        SELECT n.name, c.name FROM {lookup} n
+        JOIN {table} c ON c.id = n.id
+    ''').fetchall()
+
+
+def export_snapshot(db_path='videos.db', output_path='catalog.snapshot'):
+    """Write the catalog as a memory-mappable, columnar snapshot.
+
+    Rows are in listing order (newest release first). Every distinct string
+    is stored once in a dictionary and text columns hold string ids. Category
+    links are offset arrays per row, stored with their inverse (rows per
+    category) and a sorted name table. Returns the number of videos written.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    strings = StringDictionary()
+    
+    # Categories are numbered in UTF-8 name order
+    categories = {}
+    for kind, (_, table, _) in SNAPSHOT_KINDS.items():
+        names = sorted((row[0] for row in conn.execute(f'SELECT name FROM {table}')), key=utf8)
+        categories[kind] = {name: index for index, name in enumerate(names)}
+    
+    video_ids = array('I')
+    codes = []
+    columns = {column: array('I') for column in TEXT_COLUMNS}
+    links = {kind: (array('I', [0]), array('I')) for kind in SNAPSHOT_KINDS}
+    for row in conn.execute('SELECT * FROM video_summary ORDER BY release_date DESC, video_id DESC'):
+        video_ids.append(row['video_id'])
+        codes.append(utf8(row['video_code'] or ''))
+        for column in TEXT_COLUMNS:
+            columns[column].append(strings.intern(row[column]))
+        for kind, (column, _, _) in SNAPSHOT_KINDS.items():
+            offsets, values = links[kind]
+            values.extend(categories[kind][name] for name in json.loads(row[column]))
+            offsets.append(len(values))
+    
+    rows = len(video_ids)
+    sections = {'video_id': video_ids, **columns}
+    # Row numbers sorted by code and by video id, for binary search
+    sections['code_index'] = array('I', sorted(range(rows), key=lambda row: (codes[row], row)))
+    sections['id_index'] = array('I', sorted(range(rows), key=video_ids.__getitem__))
+    del codes
+    
+    for kind in SNAPSHOT_KINDS:
+        index = categories[kind]
+        offsets, values = links[kind]
+        posting_offsets, postings = invert(offsets, values, len(index))
+        entries = sorted(lookup_entries(conn, kind), key=lambda entry: utf8(entry[0]))
+        sections.update({
+            f'{kind}_names': array('I', (strings.intern(name) for name in index)),
+            f'{kind}_offsets': offsets,
+            f'{kind}_links': values,
+            f'{kind}_posting_offsets': posting_offsets,
+            f'{kind}_postings': postings,
+            f'{kind}_lookup_names': array('I', (strings.intern(name) for name, _ in entries)),
+            f'{kind}_lookup_targets': array('I', (index[target] for _, target in entries)),
+        })
+    conn.close()
+    
+    sections.update(strings.sections())
+    write_sections(output_path, SNAPSHOT_MAGIC, {
+        'version': SNAPSHOT_VERSION,
+        'rows': rows,
+        'text_columns': TEXT_COLUMNS,
+        'kinds': list(SNAPSHOT_KINDS),
+    }, sections)
+    print(f"Exported {rows} videos and {len(strings)} distinct strings to {output_path}")
+    return rows
+
+
+class CatalogSnapshot(SectionFile):
+    """Read-only view of a snapshot written by export_snapshot().
+
+    A SectionFile: opening costs the same for any catalog size, and a video
+    is only decoded when it is asked for. Videos are returned as dicts
+    shaped like the ones from VideoRepository.
+    """
+    
+    MAGIC = SNAPSHOT_MAGIC
+    VERSION = SNAPSHOT_VERSION
+    DESCRIPTION = 'catalog snapshot'
+    
+    def __init__(self, path):
+        super().__init__(path)
+        self.text_columns = self.header['text_columns']
+        self.kinds = self.header['kinds']
+    
+    def _links(self, kind, row):
+        offsets = self._sections[f'{kind}_offsets']
+        return self._sections[f'{kind}_links'][offsets[row]:offsets[row + 1]]
+    
+    def video(self, row):
+        """Decode the video at a listing position (0 = newest)."""
+        if not 0 <= row < self.rows:
+            raise IndexError(row)
+        video = {'video_id': self._sections['video_id'][row]}
+        for column in self.text_columns:
+            video[column] = self.string(self._sections[column][row])
+        for kind, (column, _, _) in SNAPSHOT_KINDS.items():
+            names = self._sections[f'{kind}_names']
+            video[column] = [self.string(names[index]) for index in self._links(kind, row)]
+        return video
+    
+    def page(self, limit=20, offset=0):
+        """Videos in listing order, newest first."""
+        return [self.video(row) for row in range(offset, min(offset + limit, self.rows))]
+    
+    def by_code(self, code):
+        """Return one video by its code, or None."""
+        index = self._sections['code_index']
+        column = self._sections['video_code']
+        key = utf8(code)
+        position = bisect_left(index, key, key=lambda row: self._bytes(column[row]))
+        if position < len(index) and self._bytes(column[index[position]]) == key:
+            return self.video(index[position])
+        return None
+    
+    def by_id(self, video_id):
+        """Return one video by its database id, or None."""
+        index = self._sections['id_index']
+        ids = self._sections['video_id']
+        position = bisect_left(index, video_id, key=ids.__getitem__)
+        if position < len(index) and ids[index[position]] == video_id:
+            return self.video(index[position])
+        return None
+    
+    def category_index(self, kind, name):
+        """Position of a category (by name or merged spelling), or None."""
+        names = self._sections[f'{kind}_lookup_names']
+        key = utf8(name)
+        position = bisect_left(names, key, key=self._bytes)
+        if position < len(names) and self._bytes(names[position]) == key:
+            return self._sections[f'{kind}_lookup_targets'][position]
+        return None
+    
+    def count(self, kind, name):
+        """Number of videos linked to a category."""
+        index = self.category_index(kind, name)
+        if index is None:
+            return 0
+        offsets = self._sections[f'{kind}_posting_offsets']
+        return offsets[index + 1] - offsets[index]
+    
+    def by_category(self, kind, name, limit=50, offset=0):
+        """Videos linked to an actress, genre or maker, newest first."""
+        index = self.category_index(kind, name)
+        if index is None:
+            return []
+        offsets = self._sections[f'{kind}_posting_offsets']
+        rows = self._sections[f'{kind}_postings'][offsets[index]:offsets[index + 1]]
+        return [self.video(row) for row in rows[offset:offset + limit]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a memory-mappable catalog snapshot")
+    parser.add_argument("--db", dest="db_file", default="videos.db")
+    parser.add_argument("--output", default="catalog.snapshot")
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    export_snapshot(args.db_file, args.output)
+    print(f"  Written in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,20 @@
+from datetime import date
+
+# Category kind -> (category table, junction table, junction column, stats table).
+# The importer, the repository, the facet index, the snapshot and the
+# exporters all derive their table names from this.
+CATEGORY_KINDS = {
+    'actress': ('actresses', 'video_actresses', 'actress_id', 'actress_stats'),
+    'genre': ('genres', 'video_genres', 'genre_id', 'genre_stats'),
+    'maker': ('makers', 'video_makers', 'maker_id', 'maker_stats'),
+}
+
+# Alias table and names view (names plus merged spellings) of the kinds
+# whose differently spelled names the importer merges
+ALIASED_KINDS = {
+    'actress': ('actress_aliases', 'actress_names'),
+    'maker': ('maker_aliases', 'maker_names'),
+}
+
+# videos.release_day counts days since this date
+EPOCH = date(1970, 1, 1)
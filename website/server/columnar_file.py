@@ -0,0 +1,142 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+# Magic followed by the byte length of the JSON header; sections follow the
+# header, each starting on a multiple of SECTION_ALIGNMENT bytes
+PREAMBLE = struct.Struct('<8sI')
+SECTION_ALIGNMENT = 8
+
+
+class StringDictionary:
+    """Every distinct string stored once, referred to by id; id 0 is None."""
+    
+    def __init__(self):
+        self.ids = {}
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def intern(self, value):
+        if value is None:
+            return 0
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.ids) + 1
+        return string_id
+    
+    def sections(self):
+        """string_offsets (byte offsets into one UTF-8 blob) and string_data."""
+        string_offsets = array('I', [0, 0])
+        blob = bytearray()
+        for value in self.ids:
+            blob += value.encode('utf-8')
+            string_offsets.append(len(blob))
+        return {'string_offsets': string_offsets, 'string_data': blob}
+
+
+def write_sections(output_path, magic, header, sections):
+    """Write the preamble, the JSON header and the aligned sections.
+
+    sections maps names to arrays or bytearrays; their layout is added to
+    the header as 'sections'. The header must hold the 'version' and 'rows'
+    that SectionFile reads.
+    """
+    layout = {}
+    position = 0
+    for name, data in sections.items():
+        typecode = data.typecode if isinstance(data, array) else 'B'
+        size = len(data) * (data.itemsize if isinstance(data, array) else 1)
+        # Offsets are relative to the first section
+        layout[name] = [position, size, typecode]
+        position += -(-size // SECTION_ALIGNMENT) * SECTION_ALIGNMENT
+    
+    header = json.dumps({**header, 'sections': layout}).encode('utf-8')
+    start = PREAMBLE.size + len(header)
+    start += -start % SECTION_ALIGNMENT
+    
+    with open(output_path, 'wb') as f:
+        f.write(PREAMBLE.pack(magic, len(header)))
+        f.write(header)
+        for name, data in sections.items():
+            f.write(bytes(start + layout[name][0] - f.tell()))
+            # Files are little-endian whatever machine wrote them
+            if isinstance(data, array) and sys.byteorder == 'big':
+                data = array(data.typecode, data)
+                data.byteswap()
+            f.write(data)
+
+
+class SectionFile:
+    """Read-only view of a file written by write_sections().
+
+    Opening maps the file and reads its small header, so it costs the same
+    for any file size; sections are memoryviews over the mapping, and
+    forked workers share the mapped pages. Subclasses give the magic and
+    version they accept and decode their own sections.
+    """
+    
+    MAGIC = None
+    VERSION = None
+    DESCRIPTION = 'section file'
+    
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = PREAMBLE.unpack_from(self._map)
+        if magic != self.MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a {self.DESCRIPTION}")
+        self.header = json.loads(self._map[PREAMBLE.size:PREAMBLE.size + header_size])
+        if self.header['version'] != self.VERSION:
+            self.close()
+            raise ValueError(f"Unsupported {self.DESCRIPTION} version {self.header['version']}")
+        
+        self.rows = self.header['rows']
+        start = PREAMBLE.size + header_size
+        start += -start % SECTION_ALIGNMENT
+        
+        self._view = memoryview(self._map)
+        self._sections = {}
+        for name, (offset, size, typecode) in self.header['sections'].items():
+            section = self._view[start + offset:start + offset + size]
+            if typecode == 'B':
+                self._sections[name] = section
+            elif sys.byteorder == 'little':
+                self._sections[name] = section.cast(typecode)
+            else:
+                # Big-endian machines read a swapped copy instead of the mapping
+                copy = array(typecode, section)
+                copy.byteswap()
+                self._sections[name] = copy
+    
+    def close(self):
+        for section in getattr(self, '_sections', {}).values():
+            if isinstance(section, memoryview):
+                section.release()
+        if getattr(self, '_view', None) is not None:
+            self._view.release()
+        self._map.close()
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def __len__(self):
+        return self.rows
+    
+    def _bytes(self, string_id):
+        offsets = self._sections['string_offsets']
+        return bytes(self._sections['string_data'][offsets[string_id]:offsets[string_id + 1]])
+    
+    def string(self, string_id):
+        """Decode one dictionary string; id 0 is None."""
+        if not string_id:
+            return None
+        offsets = self._sections['string_offsets']
+        return str(self._sections['string_data'][offsets[string_id]:offsets[string_id + 1]], 'utf-8')
@@ -1,22 +1,57 @@
 import sqlite3
 import csv
+import argparse
+import glob
+import re
+import json
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+from itertools import islice
 from pathlib import Path
 from datetime import datetime
 
+from categories import ALIASED_KINDS, CATEGORY_KINDS, EPOCH
+from import_metrics import ImportMetrics, print_phases, report_path_for, write_report
+from name_aliases import alias_key
+from video_repository import VideoRepository
 
-def create_database(db_path='videos.db'):
-    """Create SQLite database with normalized schema for categories."""
+
+def create_database(db_path='videos.db', rebuild=True, defer_indexes=False):
+    """Create SQLite database with normalized schema for categories.
+
+    With rebuild=False existing tables and rows are kept, so an incremental
+    import can upsert into them. With defer_indexes=True the secondary indexes
+    are left for create_indexes() to build once the data is loaded.
+    """
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
-    # Drop existing tables to recreate schema
-    cursor.execute('DROP TABLE IF EXISTS video_makers')
-    cursor.execute('DROP TABLE IF EXISTS video_genres')
-    cursor.execute('DROP TABLE IF EXISTS video_actresses')
-    cursor.execute('DROP TABLE IF EXISTS makers')
-    cursor.execute('DROP TABLE IF EXISTS genres')
-    cursor.execute('DROP TABLE IF EXISTS actresses')
-    cursor.execute('DROP TABLE IF EXISTS videos')
+    saved_aliases = {}
+    if rebuild:
+        # Merged spellings outlive a rebuild; category ids do not
+        saved_aliases = read_aliases(cursor)
+        
+        # Drop existing tables to recreate schema
+        for aliases, _ in CATEGORY_ALIASES.values():
+            cursor.execute(f'DROP TABLE IF EXISTS {aliases}')
+        cursor.execute('DROP TABLE IF EXISTS alias_links')
+        cursor.execute('DROP TABLE IF EXISTS videos_fts')
+        cursor.execute('DROP TABLE IF EXISTS release_date_errors')
+        cursor.execute('DROP TABLE IF EXISTS video_summary')
+        cursor.execute('DROP TABLE IF EXISTS video_similar')
+        cursor.execute('DROP TABLE IF EXISTS maker_stats')
+        cursor.execute('DROP TABLE IF EXISTS genre_stats')
+        cursor.execute('DROP TABLE IF EXISTS actress_stats')
+        cursor.execute('DROP TABLE IF EXISTS video_makers')
+        cursor.execute('DROP TABLE IF EXISTS video_genres')
+        cursor.execute('DROP TABLE IF EXISTS video_actresses')
+        cursor.execute('DROP TABLE IF EXISTS makers')
+        cursor.execute('DROP TABLE IF EXISTS genres')
+        cursor.execute('DROP TABLE IF EXISTS actresses')
+        cursor.execute('DROP TABLE IF EXISTS videos')
     
     # Create videos table with comprehensive metadata
     cursor.execute('''
@@ -32,11 +67,50 @@ def create_database(db_path='videos.db'):
             label TEXT,
             description TEXT,
             thumbnail_url TEXT,
+            release_day INTEGER,
+            cdn_host TEXT,
+            stream_id TEXT,
+            width INTEGER,
+            height INTEGER,
+            content_hash TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
     
+    # Columns added since the first schema; older databases gain them here
+    added_columns = ensure_columns(cursor, 'videos', {
+        'content_hash': 'TEXT',
+        'cdn_host': 'TEXT',
+        'stream_id': 'TEXT',
+        'width': 'INTEGER',
+        'height': 'INTEGER',
+        'release_day': 'INTEGER',
+    })
+    
+    # Scraped release dates that could not be parsed into release_day
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS release_date_errors (
+            video_id INTEGER PRIMARY KEY,
+            raw_value TEXT NOT NULL,
+            FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE
+        )
+    ''')
+    
+    # Log of written video ids, read by consumers that follow the library
+    # incrementally (facet_index.FacetIndex). A NULL video_id means the whole
+    # library was rebuilt. The log survives rebuilds so seq keeps growing.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS video_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            video_id INTEGER,
+            deleted INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    if rebuild:
+        cursor.execute('DELETE FROM video_changes')
+        cursor.execute('INSERT INTO video_changes (video_id) VALUES (NULL)')
+    
     # Create normalized category tables
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS actresses (
@@ -93,8 +167,154 @@ def create_database(db_path='videos.db'):
         )
     ''')
     
-    # Create indexes for performance
+    # Other spellings of a category name, mapped to the category they were
+    # merged into, and a view resolving both (see resolve_aliases)
+    for table, (aliases, names) in CATEGORY_ALIASES.items():
+        column = CATEGORY_LINKS[table][1]
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {aliases} (
+                alias TEXT PRIMARY KEY,
+                {column} INTEGER NOT NULL,
+                name_key TEXT,
+                FOREIGN KEY ({column}) REFERENCES {table}(id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(f'''
+            CREATE VIEW IF NOT EXISTS {names} (name, id) AS
+            SELECT name, id FROM {table}
+            UNION ALL
+            SELECT alias, {column} FROM {aliases}
+        ''')
+        # alias_key of every spelling; older databases gain the column here
+        # and resolve_aliases fills it in. The importer looks new names up
+        # by key, so the index is never deferred.
+        for keyed in (table, aliases):
+            ensure_columns(cursor, keyed, {'name_key': 'TEXT'})
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{keyed}_name_key ON {keyed}(name_key)')
+        for alias, canonical in saved_aliases.get(table, ()):
+            cursor.execute(
+                f'INSERT OR IGNORE INTO {table} (name, name_key) VALUES (?, ?)',
+                (canonical, alias_key(canonical))
+            )
+            cursor.execute(f'''
+                INSERT OR IGNORE INTO {aliases} (alias, {column}, name_key)
+                SELECT ?, id, ? FROM {table} WHERE name = ?
+            ''', (alias, alias_key(alias), canonical))
+    
+    # Videos that listed a category under one of its aliases, so the alias
+    # can be split off again with its videos (see unmerge_alias)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alias_links (
+            kind TEXT NOT NULL,
+            alias TEXT NOT NULL,
+            video_id INTEGER NOT NULL,
+            PRIMARY KEY (kind, alias, video_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_alias_links_video ON alias_links(video_id)')
+    
+    # Pairs of names that are never merged automatically; kept by name, so
+    # they survive rebuilds
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alias_exclusions (
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            other TEXT NOT NULL,
+            PRIMARY KEY (kind, name, other)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Full-text search index over video text and category names (rowid = videos.id)
+    search_index_exists = table_exists(cursor, 'videos_fts')
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+            video_code, title, description, actresses, genres, makers,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    ''')
+    
+    # Materialized listing rows: one per video with pre-joined category lists
+    summary_exists = table_exists(cursor, 'video_summary')
+    if summary_exists:
+        # Older summaries allowed NULL dates, which keyset predicates never match
+        columns = {row[1]: row[3] for row in cursor.execute('PRAGMA table_info(video_summary)')}
+        if not columns['release_date']:
+            cursor.execute('DROP TABLE video_summary')
+            summary_exists = False
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS video_summary (
+            video_id INTEGER PRIMARY KEY,
+            video_code TEXT,
+            video_url TEXT,
+            m3u8_url TEXT,
+            quality TEXT,
+            title TEXT,
+            release_date TEXT NOT NULL DEFAULT '',
+            director TEXT,
+            label TEXT,
+            description TEXT,
+            thumbnail_url TEXT,
+            actresses TEXT NOT NULL DEFAULT '[]',
+            genres TEXT NOT NULL DEFAULT '[]',
+            makers TEXT NOT NULL DEFAULT '[]'
+        )
+    ''')
+    
+    # Top similar videos per video, ranked; computed by build_similar.py
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS video_similar (
+            video_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            similar_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (video_id, rank)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Per-category video counts and latest release, kept in step with the junctions
+    stats_exist = all(table_exists(cursor, stats) for stats in CATEGORY_STATS.values())
+    for table, stats in CATEGORY_STATS.items():
+        column = CATEGORY_LINKS[table][1]
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {stats} (
+                {column} INTEGER PRIMARY KEY,
+                video_count INTEGER NOT NULL DEFAULT 0,
+                latest_release_date TEXT,
+                FOREIGN KEY ({column}) REFERENCES {table}(id) ON DELETE CASCADE
+            )
+        ''')
+    
+    if not defer_indexes:
+        create_indexes(cursor)
+    
+    # Databases created before these columns existed need a backfill
+    if 'cdn_host' in added_columns:
+        backfill_m3u8_columns(cursor)
+    if 'release_day' in added_columns and backfill_release_days(cursor):
+        # Normalized dates change the listing order and latest dates
+        summary_exists = stats_exist = False
+    if clear_unparsed_release_dates(cursor):
+        summary_exists = stats_exist = False
+    
+    # Databases created before the derived tables existed need a backfill
+    if not search_index_exists:
+        refresh_search_index(cursor)
+    if not summary_exists:
+        refresh_video_summary(cursor)
+    if not stats_exist:
+        refresh_category_stats(cursor)
+    
+    conn.commit()
+    return conn
+
+
+def create_indexes(cursor):
+    """Create the secondary indexes used by the client queries."""
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_code ON videos(video_code)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_release_day ON videos(release_day)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_resolution ON videos(height, width)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_cdn_host ON videos(cdn_host)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_stream_id ON videos(stream_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_actresses_video ON video_actresses(video_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_actresses_actress ON video_actresses(actress_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_genres_video ON video_genres(video_id)')
@@ -104,9 +324,545 @@ def create_database(db_path='videos.db'):
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_actresses_name ON actresses(name)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_genres_name ON genres(name)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_makers_name ON makers(name)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_summary_code ON video_summary(video_code)')
+    # Composite key for keyset pagination of release-ordered listings
+    cursor.execute('DROP INDEX IF EXISTS idx_video_summary_release')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_video_summary_listing
+        ON video_summary(release_date DESC, video_id DESC)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_similar_similar ON video_similar(similar_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_actress_stats_count ON actress_stats(video_count DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_genre_stats_count ON genre_stats(video_count DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_maker_stats_count ON maker_stats(video_count DESC)')
+
+
+def ensure_columns(cursor, table, columns):
+    """Add any of the given {name: type} columns that a table is missing.
+
+    Returns the names of the columns that were added.
+    """
+    cursor.execute(f'PRAGMA table_info({table})')
+    existing = {row[1] for row in cursor.fetchall()}
+    added = []
+    for name, column_type in columns.items():
+        if name not in existing:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+            added.append(name)
+    return added
+
+
+def backfill_release_days(cursor):
+    """Normalize stored release dates and fill release_day for older databases.
+
+    Returns the number of videos whose release_date text was rewritten.
+    """
+    rows = cursor.execute('SELECT id, release_date FROM videos').fetchall()
+    updates = []
+    errors = []
+    rewritten = 0
+    for video_id, raw_value in rows:
+        iso_date, day = parse_release_date(raw_value)
+        if day is None and raw_value:
+            errors.append((video_id, raw_value))
+        if (iso_date or '') != (raw_value or ''):
+            rewritten += 1
+        updates.append((iso_date or '', day, video_id))
+    cursor.executemany('UPDATE videos SET release_date = ?, release_day = ? WHERE id = ?', updates)
+    cursor.executemany(
+        'INSERT OR REPLACE INTO release_date_errors (video_id, raw_value) VALUES (?, ?)', errors
+    )
+    return rewritten
+
+
+def clear_unparsed_release_dates(cursor):
+    """Blank release dates that did not parse, for databases that stored them as scraped.
+
+    Raw text sorted above every ISO date, so such videos led the listings
+    and the latest release dates of their categories. The raw values are
+    kept in release_date_errors. Returns the number of videos blanked.
+    """
+    unparsed = "release_day IS NULL AND release_date <> ''"
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO release_date_errors (video_id, raw_value)
+        SELECT id, release_date FROM videos WHERE {unparsed}
+    ''')
+    return cursor.execute(f"UPDATE videos SET release_date = '' WHERE {unparsed}").rowcount
+
+
+def backfill_m3u8_columns(cursor):
+    """Fill quality and the decomposed m3u8 columns for already stored videos."""
+    rows = cursor.execute('SELECT id, m3u8_url FROM videos WHERE m3u8_url IS NOT NULL').fetchall()
+    updates = []
+    for video_id, m3u8_url in rows:
+        info = parse_m3u8_url(m3u8_url)
+        updates.append((
+            quality_label(info), info['cdn_host'], info['stream_id'],
+            info['width'], info['height'], video_id
+        ))
+    cursor.executemany('''
+        UPDATE videos SET quality = ?, cdn_host = ?, stream_id = ?, width = ?, height = ?
+        WHERE id = ?
+    ''', updates)
+
+
+def read_aliases(cursor):
+    """Return {category table: [(alias, canonical name), ...]} as stored."""
+    saved = {}
+    for table, (aliases, _) in CATEGORY_ALIASES.items():
+        if table_exists(cursor, aliases):
+            column = CATEGORY_LINKS[table][1]
+            saved[table] = cursor.execute(f'''
+                SELECT a.alias, c.name FROM {aliases} a
+                JOIN {table} c ON c.id = a.{column}
+            ''').fetchall()
+    return saved
+
+
+def table_exists(cursor, name):
+    """Check whether a table (or virtual table) exists in the main schema."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ? AND type = 'table'", (name,))
+    return cursor.fetchone() is not None
+
+
+# Category names of video v in CSV order, for tables derived from the junctions
+CATEGORY_NAMES_SQL = {
+    'actresses': '''SELECT a.name FROM video_actresses va
+                    JOIN actresses a ON va.actress_id = a.id
+                    WHERE va.video_id = v.id ORDER BY va.rowid''',
+    'genres': '''SELECT g.name FROM video_genres vg
+                 JOIN genres g ON vg.genre_id = g.id
+                 WHERE vg.video_id = v.id ORDER BY vg.rowid''',
+    'makers': '''SELECT m.name FROM video_makers vm
+                 JOIN makers m ON vm.maker_id = m.id
+                 WHERE vm.video_id = v.id ORDER BY vm.rowid''',
+}
+
+
+def category_names(table, aggregate="GROUP_CONCAT(name, ', ')"):
+    """SQL expression aggregating the category names of video v."""
+    return f'(SELECT {aggregate} FROM ({CATEGORY_NAMES_SQL[table]}))'
+
+
+def refresh_search_index(cursor, batch=False):
+    """Rewrite videos_fts rows for the current batch, or for every video.
+
+    With batch=True only the ids in the batch_videos temp table are refreshed.
+    """
+    if batch:
+        cursor.execute('DELETE FROM videos_fts WHERE rowid IN (SELECT id FROM batch_videos)')
+        where = 'WHERE v.id IN (SELECT id FROM batch_videos)'
+    else:
+        cursor.execute('DELETE FROM videos_fts')
+        where = ''
     
-    conn.commit()
-    return conn
+    cursor.execute(f'''
+        INSERT INTO videos_fts (rowid, video_code, title, description, actresses, genres, makers)
+        SELECT v.id, v.video_code, v.title, v.description,
+               {category_names('actresses')},
+               {category_names('genres')},
+               {category_names('makers')}
+        FROM videos v
+        {where}
+    ''')
+
+
+def refresh_video_summary(cursor, batch=False):
+    """Rewrite video_summary rows for the current batch, or for every video.
+
+    Category lists are stored as JSON arrays so a listing needs no joins.
+    Undated videos get an empty release_date, so they sort last in listings.
+    With batch=True only the ids in the batch_videos temp table are refreshed.
+    """
+    if batch:
+        cursor.execute('DELETE FROM video_summary WHERE video_id IN (SELECT id FROM batch_videos)')
+        where = 'WHERE v.id IN (SELECT id FROM batch_videos)'
+    else:
+        cursor.execute('DELETE FROM video_summary')
+        where = ''
+    
+    cursor.execute(f'''
+        INSERT INTO video_summary (
+            video_id, video_code, video_url, m3u8_url, quality, title, release_date,
+            director, label, description, thumbnail_url, actresses, genres, makers
+        )
+        SELECT v.id, v.video_code, v.video_url, v.m3u8_url, v.quality, v.title,
+               COALESCE(v.release_date, ''),
+               v.director, v.label, v.description, v.thumbnail_url,
+               {category_names('actresses', 'json_group_array(name)')},
+               {category_names('genres', 'json_group_array(name)')},
+               {category_names('makers', 'json_group_array(name)')}
+        FROM videos v
+        {where}
+    ''')
+
+
+def create_batch_tables(cursor):
+    """Create the temp tables that track what a batch of writes touched.
+
+    batch_videos holds the ids of the videos written by the current batch,
+    batch_links the category links it removed and added, for keeping the
+    derived tables in step.
+    """
+    cursor.execute('CREATE TEMP TABLE IF NOT EXISTS batch_videos (id INTEGER PRIMARY KEY)')
+    cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS batch_links (
+            kind TEXT NOT NULL,
+            category_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            release_date TEXT
+        )
+    ''')
+
+
+def record_batch_links(cursor, delta):
+    """Log the current links of the batch's videos into batch_links.
+
+    Called with delta=-1 before a batch is written and delta=+1 after it, so
+    the log holds exactly the links the batch removed and added.
+    """
+    for table, (junction, column) in CATEGORY_LINKS.items():
+        cursor.execute(f'''
+            INSERT INTO batch_links (kind, category_id, delta, release_date)
+            SELECT ?, j.{column}, ?, COALESCE(v.release_date, '')
+            FROM {junction} j
+            JOIN videos v ON v.id = j.video_id
+            WHERE j.video_id IN (SELECT id FROM batch_videos)
+        ''', (table, delta))
+
+
+def refresh_category_stats(cursor, batch=False):
+    """Update actress_stats, genre_stats and maker_stats.
+
+    Without batch every row is recomputed. With batch=True the link changes
+    logged in batch_links are applied as deltas; a category's latest release
+    date is only recomputed when the batch removed the video that carried it.
+    """
+    for table, stats in CATEGORY_STATS.items():
+        junction, column = CATEGORY_LINKS[table]
+        
+        if not batch:
+            cursor.execute(f'DELETE FROM {stats}')
+            cursor.execute(f'''
+                INSERT INTO {stats} ({column}, video_count, latest_release_date)
+                SELECT j.{column}, COUNT(*), MAX(COALESCE(v.release_date, ''))
+                FROM {junction} j
+                JOIN videos v ON v.id = j.video_id
+                GROUP BY j.{column}
+            ''')
+            continue
+        
+        deltas = cursor.execute(f'''
+            SELECT b.category_id, SUM(b.delta),
+                   MAX(CASE WHEN b.delta > 0 THEN b.release_date END),
+                   MAX(CASE WHEN b.delta < 0 THEN b.release_date END),
+                   s.latest_release_date
+            FROM batch_links b
+            LEFT JOIN {stats} s ON s.{column} = b.category_id
+            WHERE b.kind = ?
+            GROUP BY b.category_id
+        ''', (table,)).fetchall()
+        
+        cursor.executemany(f'''
+            INSERT INTO {stats} ({column}, video_count, latest_release_date)
+            VALUES (?, ?, ?)
+            ON CONFLICT({column}) DO UPDATE SET
+                video_count = video_count + excluded.video_count,
+                latest_release_date = MAX(
+                    COALESCE(latest_release_date, ''),
+                    COALESCE(excluded.latest_release_date, '')
+                )
+        ''', [(category_id, delta, added) for category_id, delta, added, _, _ in deltas])
+        
+        # Removing the newest video of a category invalidates its latest date,
+        # unless the batch re-added a video at least as new
+        stale = [
+            (category_id,)
+            for category_id, _, added, removed, latest in deltas
+            if removed is not None and latest is not None and removed >= latest
+            and (added is None or added < removed)
+        ]
+        cursor.executemany(f'''
+            UPDATE {stats} SET latest_release_date = (
+                SELECT MAX(COALESCE(v.release_date, ''))
+                FROM {junction} j
+                JOIN videos v ON v.id = j.video_id
+                WHERE j.{column} = {stats}.{column}
+            )
+            WHERE {column} = ?
+        ''', stale)
+        
+        cursor.execute(f'DELETE FROM {stats} WHERE video_count <= 0')
+
+
+def merge_categories(cursor, table, merges):
+    """Merge categories into others, given {duplicate id: canonical id}.
+
+    The duplicates' links move to the canonical category, their names
+    become its aliases and the duplicates are deleted. The derived rows of
+    the affected videos are refreshed and the videos are logged in
+    video_changes. Returns the number of categories merged.
+    """
+    junction, column = CATEGORY_LINKS[table]
+    aliases, _ = CATEGORY_ALIASES[table]
+    
+    # Follow chains of merges to their end, ignoring cycles
+    resolved = {}
+    for duplicate_id, canonical_id in merges.items():
+        seen = {duplicate_id}
+        while canonical_id in merges and canonical_id not in seen:
+            seen.add(canonical_id)
+            canonical_id = merges[canonical_id]
+        if canonical_id not in seen:
+            resolved[duplicate_id] = canonical_id
+    if not resolved:
+        return 0
+    
+    create_batch_tables(cursor)
+    cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS category_merges (
+            duplicate_id INTEGER PRIMARY KEY,
+            canonical_id INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('DELETE FROM category_merges')
+    cursor.executemany('INSERT INTO category_merges VALUES (?, ?)', resolved.items())
+    merged_ids = 'SELECT duplicate_id FROM category_merges'
+    canonical_of = f'(SELECT canonical_id FROM category_merges WHERE duplicate_id = {column})'
+    
+    cursor.execute('DELETE FROM batch_videos')
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO batch_videos (id)
+        SELECT video_id FROM {junction} WHERE {column} IN ({merged_ids})
+    ''')
+    cursor.execute('DELETE FROM batch_links')
+    record_batch_links(cursor, -1)
+    
+    # The videos of a duplicate listed it under its own name
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO alias_links (kind, alias, video_id)
+        SELECT ?, c.name, j.video_id FROM {junction} j
+        JOIN {table} c ON c.id = j.{column}
+        WHERE j.{column} IN ({merged_ids})
+    ''', (table,))
+    
+    # Links keep their rowid, so names stay in CSV order; a video linked
+    # under both names keeps the canonical link only
+    cursor.execute(f'''
+        UPDATE OR IGNORE {junction} SET {column} = {canonical_of}
+        WHERE {column} IN ({merged_ids})
+    ''')
+    cursor.execute(f'DELETE FROM {junction} WHERE {column} IN ({merged_ids})')
+    
+    # Earlier aliases of the duplicates and their own names now resolve to
+    # the canonical category
+    cursor.execute(f'''
+        UPDATE {aliases} SET {column} = {canonical_of}
+        WHERE {column} IN ({merged_ids})
+    ''')
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO {aliases} (alias, {column}, name_key)
+        SELECT c.name, m.canonical_id, c.name_key FROM {table} c
+        JOIN category_merges m ON m.duplicate_id = c.id
+    ''')
+    cursor.execute(f'DELETE FROM {table} WHERE id IN ({merged_ids})')
+    
+    record_batch_links(cursor, 1)
+    refresh_search_index(cursor, batch=True)
+    refresh_video_summary(cursor, batch=True)
+    refresh_category_stats(cursor, batch=True)
+    cursor.execute('INSERT INTO video_changes (video_id) SELECT id FROM batch_videos')
+    return len(resolved)
+
+
+def resolve_aliases(cursor, full=False):
+    """Merge actresses and makers whose names are spellings of one another.
+
+    Names share a name_key (name_aliases.alias_key, which ignores case,
+    width, diacritics and name order) with their spellings; keys missing
+    from older rows are filled in first. Only the groups of those names are
+    looked up, through the name_key indexes, unless full=True. Every group
+    is merged into its member with the most videos, except for members kept
+    apart from it in alias_exclusions. Returns {table: number of categories
+    merged}.
+    """
+    merged = {}
+    for table, (aliases, _) in CATEGORY_ALIASES.items():
+        column = CATEGORY_LINKS[table][1]
+        keys = set()
+        for keyed, name_column in ((table, 'name'), (aliases, 'alias')):
+            rows = cursor.execute(
+                f'SELECT {name_column} FROM {keyed} WHERE name_key IS NULL'
+            ).fetchall()
+            updates = [(alias_key(name), name) for (name,) in rows]
+            cursor.executemany(f'UPDATE {keyed} SET name_key = ? WHERE {name_column} = ?', updates)
+            keys.update(key for key, _ in updates)
+        if full:
+            keys = {key for (key,) in cursor.execute(f'''
+                SELECT name_key FROM {table} GROUP BY name_key HAVING COUNT(*) > 1
+                UNION
+                SELECT a.name_key FROM {aliases} a
+                JOIN {table} c ON c.name_key = a.name_key AND c.id <> a.{column}
+            ''')}
+        keys.discard('')
+        
+        excluded = excluded_pairs(cursor, table)
+        merges = {}
+        for key in keys:
+            # Categories with the key, and those with an alias having it
+            group = cursor.execute(f'''
+                SELECT c.id, c.name, COALESCE(st.video_count, 0) FROM {table} c
+                LEFT JOIN {CATEGORY_STATS[table]} st ON st.{column} = c.id
+                WHERE c.id IN (
+                    SELECT id FROM {table} WHERE name_key = ?1
+                    UNION SELECT {column} FROM {aliases} WHERE name_key = ?1
+                )
+            ''', (key,)).fetchall()
+            if len(group) < 2:
+                continue
+            canonical_id, canonical, _ = min(group, key=lambda row: (-row[2], row[0]))
+            for category_id, name, _ in group:
+                if category_id != canonical_id and frozenset((name, canonical)) not in excluded:
+                    merges[category_id] = canonical_id
+        merged[table] = merge_categories(cursor, table, merges)
+    return merged
+
+
+def excluded_pairs(cursor, table):
+    """Pairs of names kept apart by keep_apart(), as frozensets."""
+    return {
+        frozenset(pair) for pair in
+        cursor.execute('SELECT name, other FROM alias_exclusions WHERE kind = ?', (table,))
+    }
+
+
+def keep_apart(cursor, table, name, other):
+    """Record that two names are different categories, never merged automatically."""
+    cursor.execute(
+        'INSERT OR IGNORE INTO alias_exclusions (kind, name, other) VALUES (?, ?, ?)',
+        (table,) + tuple(sorted((name, other)))
+    )
+
+
+def unmerge_alias(cursor, table, alias):
+    """Split an alias off its category into a category of its own.
+
+    The videos that listed the alias (alias_links) move to the new category
+    and the two names are kept apart from then on. Derived rows are
+    refreshed and the videos logged as in merge_categories(). Returns the
+    number of videos moved, or None if the name is not an alias.
+    """
+    junction, column = CATEGORY_LINKS[table]
+    aliases, _ = CATEGORY_ALIASES[table]
+    row = cursor.execute(f'''
+        SELECT c.id, c.name FROM {aliases} a JOIN {table} c ON c.id = a.{column}
+        WHERE a.alias = ?
+    ''', (alias,)).fetchone()
+    if row is None:
+        return None
+    canonical_id, canonical = row
+    
+    cursor.execute(f'DELETE FROM {aliases} WHERE alias = ?', (alias,))
+    cursor.execute(f'INSERT INTO {table} (name, name_key) VALUES (?, ?)', (alias, alias_key(alias)))
+    category_id = cursor.lastrowid
+    keep_apart(cursor, table, alias, canonical)
+    
+    create_batch_tables(cursor)
+    cursor.execute('DELETE FROM batch_videos')
+    cursor.execute('''
+        INSERT INTO batch_videos (id)
+        SELECT video_id FROM alias_links WHERE kind = ? AND alias = ?
+    ''', (table, alias))
+    cursor.execute('DELETE FROM batch_links')
+    record_batch_links(cursor, -1)
+    cursor.execute(f'''
+        UPDATE OR IGNORE {junction} SET {column} = ?
+        WHERE {column} = ? AND video_id IN (SELECT id FROM batch_videos)
+    ''', (category_id, canonical_id))
+    cursor.execute('DELETE FROM alias_links WHERE kind = ? AND alias = ?', (table, alias))
+    
+    record_batch_links(cursor, 1)
+    refresh_search_index(cursor, batch=True)
+    refresh_video_summary(cursor, batch=True)
+    refresh_category_stats(cursor, batch=True)
+    cursor.execute('INSERT INTO video_changes (video_id) SELECT id FROM batch_videos')
+    return cursor.execute('SELECT COUNT(*) FROM batch_videos').fetchone()[0]
+
+
+def apply_pragmas(conn, pragmas):
+    """Apply a mapping of PRAGMA name -> value to a connection."""
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+
+
+# m3u8 values the scraper writes when it did not capture a stream
+MISSING_M3U8 = ('Not found', 'Error')
+
+STREAM_ID_PATTERN = re.compile(
+    r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE
+)
+RESOLUTION_PATTERN = re.compile(r'^(\d{2,5})x(\d{2,5})$')
+HEIGHT_PATTERN = re.compile(r'^(\d{3,4})p$')
+
+
+def parse_m3u8_url(m3u8_url):
+    """Split an m3u8 URL into CDN host, stream UUID and resolution.
+
+    e.g. https://surrit.com/618b45a8-.../1280x720/video.m3u8 gives host
+    'surrit.com', the UUID and 1280x720. Parts that are not present are None.
+    """
+    info = {'cdn_host': None, 'stream_id': None, 'width': None, 'height': None}
+    if not m3u8_url or m3u8_url in MISSING_M3U8:
+        return info
+    
+    parsed = urlsplit(m3u8_url)
+    info['cdn_host'] = parsed.hostname
+    for segment in parsed.path.split('/'):
+        if info['stream_id'] is None and STREAM_ID_PATTERN.match(segment):
+            info['stream_id'] = segment.lower()
+            continue
+        if info['height'] is None:
+            resolution = RESOLUTION_PATTERN.match(segment)
+            if resolution:
+                info['width'], info['height'] = int(resolution.group(1)), int(resolution.group(2))
+                continue
+            height = HEIGHT_PATTERN.match(segment)
+            if height:
+                info['height'] = int(height.group(1))
+    return info
+
+
+# Release date layouts seen on scraped pages, tried in order
+RELEASE_DATE_FORMATS = (
+    '%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d', '%Y%m%d',
+    '%b %d, %Y', '%B %d, %Y', '%d %b %Y', '%d %B %Y',
+)
+
+
+def parse_release_date(value):
+    """Parse a scraped release date into (ISO date, day number since 1970-01-01).
+
+    Returns (None, None) when the value is empty or in no known layout.
+    """
+    value = (value or '').strip()
+    if not value:
+        return None, None
+    # Drop a time part such as '2020-06-12 00:00:00' or '2020-06-12T00:00'
+    value = re.split(r'[T ]\d{1,2}:', value, maxsplit=1)[0].strip()
+    for layout in RELEASE_DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(value, layout).date()
+        except ValueError:
+            continue
+        return parsed.isoformat(), (parsed - EPOCH).days
+    return None, None
+
+
+def quality_label(m3u8_info):
+    """Human readable quality such as '720p', or None if the URL has none."""
+    if m3u8_info['height'] is None:
+        return None
+    return f"{m3u8_info['height']}p"
 
 
 def extract_video_info(video_url, m3u8_url):
@@ -115,129 +871,576 @@ def extract_video_info(video_url, m3u8_url):
     # Use code from CSV if available, otherwise fallback to URL parsing
     video_code = video_url.rstrip('/').split('/')[-1]
     
-    # Extract quality from m3u8 URL
-    quality = None
-    if m3u8_url and m3u8_url != 'Not found':
-        parts = m3u8_url.split('/')
-        for part in parts:
-            if 'x' in part or 'p' in part:
-                quality = part
-                break
+    # Quality comes from the resolution segment of the m3u8 URL
+    quality = quality_label(parse_m3u8_url(m3u8_url))
     
     return video_code, quality
 
 
-def import_csv_to_db(csv_path, db_path='videos.db'):
-    """Import CSV data into SQLite database with normalized categories."""
-    if not Path(csv_path).exists():
-        print(f"Error: {csv_path} not found!")
-        return
+# Junction table and column for each normalized category table
+CATEGORY_LINKS = {table: (junction, column) for table, junction, column, _ in CATEGORY_KINDS.values()}
+
+# Facet statistics table for each normalized category table
+CATEGORY_STATS = {table: stats for table, _, _, stats in CATEGORY_KINDS.values()}
+
+# Alias table and name view (names plus aliases) for the category tables
+# whose spellings are merged
+CATEGORY_ALIASES = {CATEGORY_KINDS[kind][0]: tables for kind, tables in ALIASED_KINDS.items()}
+
+# Video columns written by the importer, in insert order
+VIDEO_COLUMNS = (
+    'video_url', 'm3u8_url', 'video_code', 'quality',
+    'title', 'release_date', 'director', 'label', 'description', 'thumbnail_url',
+    'release_day', 'cdn_host', 'stream_id', 'width', 'height', 'content_hash'
+)
+
+# Rows buffered before the loader writes them with executemany and commits
+BATCH_SIZE = 10000
+
+# Parsed records handed from the CSV readers to the loader per timed step
+PARSE_CHUNK = 1000
+
+# Shards parsed ahead of the loader, per parse worker
+SHARDS_IN_FLIGHT_PER_WORKER = 2
+
+# Connection settings for a bulk session. Durability is traded for speed
+# while loading; the journal mode is chosen per import in import_csv_to_db.
+BULK_PRAGMAS = {
+    'synchronous': 'OFF',
+    'cache_size': -262144,  # 256 MiB
+    'temp_store': 'MEMORY',
+    'mmap_size': 1073741824,  # 1 GiB
+}
+
+
+def split_names(value):
+    """Split a comma-separated category field into clean names."""
+    if not value:
+        return []
+    # dict.fromkeys drops repeated names but keeps their order
+    return list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+
+
+def content_hash(record):
+    """Hash everything the importer stores for a record, categories included.
+
+    Two scrapes of an unchanged video produce the same hash, so the loader
+    can skip the row without touching the database.
+    """
+    payload = [record[column] for column in VIDEO_COLUMNS if column != 'content_hash']
+    payload.extend(record[table] for table in CATEGORY_LINKS)
+    # Only present when set, so hashes of rows with good dates are unchanged
+    if record['unparsed_release_date']:
+        payload.append(record['unparsed_release_date'])
+    encoded = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def parse_csv_row(row):
+    """Normalize one CSV row into a video record with category name lists."""
+    video_url = row.get('video_url', '')
+    m3u8_url = row.get('m3u8_url', '')
     
-    conn = create_database(db_path)
-    cursor = conn.cursor()
+    # Parse fallback/legacy logic
+    video_code_fallback, quality = extract_video_info(video_url, m3u8_url)
+    
+    if m3u8_url in MISSING_M3U8:
+        m3u8_url = None
     
-    # Read CSV and import data
-    imported = 0
-    skipped = 0
-    actress_count = 0
-    genre_count = 0
-    maker_count = 0
+    maker_name = (row.get('maker') or '').strip()
     
+    # Dates are stored ISO-normalized so text order is chronological. Values
+    # that don't parse are stored as '' (unknown, listed last) and reported
+    # by the loader as scraped
+    raw_release_date = (row.get('release_date') or '').strip()
+    iso_release_date, release_day = parse_release_date(raw_release_date)
+    
+    record = {
+        'video_url': video_url,
+        'm3u8_url': m3u8_url,
+        # Get values from CSV or fallback
+        'video_code': row.get('code') or video_code_fallback,
+        'quality': quality,
+        'title': row.get('title', ''),
+        'release_date': iso_release_date or '',
+        'release_day': release_day,
+        'unparsed_release_date': raw_release_date if release_day is None and raw_release_date else None,
+        'director': row.get('director', ''),
+        'label': row.get('label', ''),
+        'description': row.get('description', ''),
+        'thumbnail_url': row.get('thumbnail_url', ''),
+        **parse_m3u8_url(m3u8_url),
+        'actresses': split_names(row.get('actress', '')),
+        'genres': split_names(row.get('genre', '')),
+        'makers': [maker_name] if maker_name else [],
+    }
+    record['content_hash'] = content_hash(record)
+    return record
+
+
+def resolve_csv_paths(csv_source):
+    """Expand a CSV file, a directory of shards or a glob into sorted paths.
+
+    Shards are sorted by name so that, when the same video_url appears in
+    several shards, the first one in that order wins.
+    """
+    source = Path(csv_source)
+    if source.is_dir():
+        return sorted(source.glob('*.csv'))
+    if glob.has_magic(str(csv_source)):
+        return sorted(Path(path) for path in glob.glob(str(csv_source)))
+    return [source] if source.exists() else []
+
+
+def parse_csv_file(csv_path):
+    """Read one CSV shard into a list of parsed records.
+
+    Runs inside the import process pool, so it only touches the file.
+    """
     with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+        return [parse_csv_row(row) for row in csv.DictReader(f)]
+
+
+def iter_csv_records(csv_paths, workers=None):
+    """Yield parsed records for every shard, in shard order.
+
+    Several shards are parsed in parallel by a process pool; a single shard
+    is parsed in this process to avoid the pool start-up cost. Parsing
+    outpaces the single writer, so at most SHARDS_IN_FLIGHT_PER_WORKER
+    shards per worker are parsed ahead of the one being loaded, which keeps
+    memory bounded however many shards there are.
+    """
+    if len(csv_paths) == 1 or workers == 1:
+        for csv_path in csv_paths:
+            yield from parse_csv_file(csv_path)
+        return
+    
+    # The pool's own default, made explicit to size the window
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = SHARDS_IN_FLIGHT_PER_WORKER * workers
+        paths = iter(csv_paths)
+        # Results are taken in submission order, so duplicates resolve the
+        # same on every run
+        pending = deque(executor.submit(parse_csv_file, path) for path in islice(paths, window))
+        while pending:
+            records = pending.popleft().result()
+            for path in islice(paths, 1):
+                pending.append(executor.submit(parse_csv_file, path))
+            yield from records
+            del records
+
+
+class BulkLoader:
+    """Batched video writer backed by in-memory name->id maps.
+
+    With preload=True every category id and existing video id is loaded up
+    front, so a row costs no lookups against the database; that suits a
+    rebuild, where the tables start out (nearly) empty. With preload=False
+    the maps only hold what prefetch() looked up for the records about to
+    be added, so an incremental import costs in proportion to its CSV
+    rather than to the library. New video ids are assigned here, which lets
+    videos and junction rows go through executemany together.
+    """
+    
+    def __init__(self, conn, batch_size=BATCH_SIZE, metrics=None, log_changes=True, preload=True):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.batch_size = batch_size
+        self.log_changes = log_changes
+        self.preload = preload
+        self.metrics = metrics or ImportMetrics()
         
-        for row in reader:
-            video_url = row.get('video_url', '')
-            m3u8_url = row.get('m3u8_url', '')
+        # Known spellings resolve through the same maps; a new spelling of a
+        # known name is matched on its alias key (see key_match) and recorded
+        # as an alias
+        self.category_ids = {table: {} for table in CATEGORY_LINKS}
+        self.alias_names = {table: set() for table in CATEGORY_ALIASES}
+        self.excluded = {table: excluded_pairs(self.cursor, table) for table in CATEGORY_ALIASES}
+        self.aliased = 0
+        self.video_ids = {}
+        self.content_hashes = {}
+        if preload:
+            self._load_categories(None)
+            self._load_videos('SELECT video_url, id, content_hash FROM videos', ())
+        
+        # AUTOINCREMENT never reuses ids, so continue after the recorded sequence
+        max_id = self.cursor.execute('SELECT COALESCE(MAX(id), 0) FROM videos').fetchone()[0]
+        sequence = self.cursor.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'videos'"
+        ).fetchone()
+        self.next_video_id = max(max_id, sequence[0] if sequence else 0) + 1
+        
+        create_batch_tables(self.cursor)
+        
+        self.seen_urls = set()
+        self.imported = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.unparsed_dates = 0
+        self.skipped = 0
+        self.link_counts = {table: 0 for table in CATEGORY_LINKS}
+        self._reset_batch()
+    
+    def _load_categories(self, names):
+        """Add stored names and aliases to the maps; all of them if names is None."""
+        for table in CATEGORY_LINKS:
+            tables = [(table, 'name', 'id')]
+            if table in CATEGORY_ALIASES:
+                tables.append((CATEGORY_ALIASES[table][0], 'alias', CATEGORY_LINKS[table][1]))
+            for source, name_column, id_column in tables:
+                sql = f'SELECT {name_column}, {id_column} FROM {source}'
+                params = ()
+                if names is not None:
+                    wanted = [name for name in names[table] if name not in self.category_ids[table]]
+                    if not wanted:
+                        continue
+                    # A lookup per batch on the UNIQUE name and alias indexes
+                    sql += f' WHERE {name_column} IN (SELECT value FROM json_each(?))'
+                    params = (json.dumps(wanted),)
+                ids = self.category_ids[table]
+                for name, category_id in self.cursor.execute(sql, params):
+                    ids.setdefault(name, category_id)
+                    if source != table:
+                        self.alias_names[table].add(name)
+    
+    def _load_videos(self, sql, params):
+        for video_url, video_id, stored_hash in self.cursor.execute(sql, params):
+            self.video_ids[video_url] = video_id
+            self.content_hashes[video_id] = stored_hash
+    
+    def prefetch(self, records=(), video_urls=()):
+        """Look up the stored videos and categories of the records about to be added.
+
+        Required before add() or remove() when the loader was created with
+        preload=False; does nothing otherwise. video_urls are looked up for
+        remove().
+        """
+        if self.preload:
+            return
+        urls = [record['video_url'] for record in records] + list(video_urls)
+        urls = [url for url in urls if url not in self.video_ids and url not in self.seen_urls]
+        if urls:
+            self._load_videos('''
+                SELECT video_url, id, content_hash FROM videos
+                WHERE video_url IN (SELECT value FROM json_each(?))
+            ''', (json.dumps(urls),))
+        self._load_categories({
+            table: {name for record in records for name in record[table]}
+            for table in CATEGORY_LINKS
+        })
+    
+    def _reset_batch(self):
+        self.new_videos = []
+        self.changed_videos = []
+        self.removed_ids = []
+        self.links = {table: [] for table in CATEGORY_LINKS}
+        self.alias_links = []
+        self.date_errors = []
+        self.pending = 0
+    
+    def category_id(self, table, name):
+        """Return the id for a category name, creating the category if new."""
+        ids = self.category_ids[table]
+        category_id = ids.get(name)
+        if category_id is not None:
+            return category_id
+        
+        if table not in CATEGORY_ALIASES:
+            self.cursor.execute(f'INSERT INTO {table} (name) VALUES (?)', (name,))
+            category_id = ids[name] = self.cursor.lastrowid
+            return category_id
+        
+        key = alias_key(name)
+        category_id = self.key_match(table, name, key) if key else None
+        if category_id is not None:
+            aliases, _ = CATEGORY_ALIASES[table]
+            self.cursor.execute(f'''
+                INSERT INTO {aliases} (alias, {CATEGORY_LINKS[table][1]}, name_key)
+                VALUES (?, ?, ?)
+            ''', (name, category_id, key))
+            self.alias_names[table].add(name)
+            self.aliased += 1
+        else:
+            self.cursor.execute(f'INSERT INTO {table} (name, name_key) VALUES (?, ?)', (name, key))
+            category_id = self.cursor.lastrowid
+        ids[name] = category_id
+        return category_id
+    
+    def key_match(self, table, name, key):
+        """Id of the category a new spelling belongs to, found by its alias key.
+
+        Looks the key up among the names and aliases through their name_key
+        indexes, skipping categories the name is kept apart from.
+        """
+        aliases, _ = CATEGORY_ALIASES[table]
+        column = CATEGORY_LINKS[table][1]
+        matches = self.cursor.execute(f'''
+            SELECT id, name FROM {table} WHERE name_key = ?1
+            UNION
+            SELECT c.id, c.name FROM {aliases} a JOIN {table} c ON c.id = a.{column}
+            WHERE a.name_key = ?1
+            ORDER BY 1
+        ''', (key,)).fetchall()
+        for category_id, canonical in matches:
+            if frozenset((name, canonical)) not in self.excluded[table]:
+                return category_id
+        return None
+    
+    def add(self, record):
+        """Queue one parsed record, flushing when the batch is full."""
+        video_url = record['video_url']
+        
+        # A URL repeated within the import is a duplicate in either mode
+        if video_url in self.seen_urls:
+            print(f"Skipping duplicate: {video_url}")
+            self.skipped += 1
+            return
+        self.seen_urls.add(video_url)
+        
+        values = tuple(record[column] for column in VIDEO_COLUMNS)
+        video_id = self.video_ids.get(video_url)
+        if video_id is None:
+            video_id = self.video_ids[video_url] = self.next_video_id
+            self.next_video_id += 1
+            self.new_videos.append((video_id,) + values)
+            self.imported += 1
+        elif self.content_hashes.get(video_id) == record['content_hash']:
+            # Same content as stored: no video, link or derived row changes
+            self.unchanged += 1
+            return
+        else:
+            # Update video in place so its id is kept; links are rewritten below
+            self.changed_videos.append(values[1:] + (video_id,))
+            self.content_hashes[video_id] = record['content_hash']
+            self.updated += 1
+        
+        for table in CATEGORY_LINKS:
+            aliases = self.alias_names.get(table, ())
+            for name in record[table]:
+                self.links[table].append((video_id, self.category_id(table, name)))
+                if name in aliases:
+                    self.alias_links.append((table, name, video_id))
+        
+        if record['unparsed_release_date']:
+            self.date_errors.append((video_id, record['unparsed_release_date']))
+        
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+    
+    def remove(self, video_url):
+        """Queue a video for deletion. Returns False if it is not in the database."""
+        video_id = self.video_ids.pop(video_url, None)
+        if video_id is None:
+            return False
+        self.content_hashes.pop(video_id, None)
+        self.removed_ids.append((video_id,))
+        self.deleted += 1
+        
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+        return True
+    
+    def flush(self):
+        """Write the queued batch and commit it."""
+        if not self.pending:
+            return
+        cursor = self.cursor
+        phase = self.metrics.phase
+        changed_ids = [(values[-1],) for values in self.changed_videos]
+        stale_ids = changed_ids + self.removed_ids
+        
+        with phase('junctions'):
+            # Register the batch first so the links it replaces are logged
+            cursor.execute('DELETE FROM batch_videos')
+            cursor.executemany(
+                'INSERT INTO batch_videos (id) VALUES (?)',
+                [(values[0],) for values in self.new_videos] + stale_ids
+            )
+            cursor.execute('DELETE FROM batch_links')
+            record_batch_links(cursor, -1)
+            
+            # Updated videos get exactly the categories from the CSV; removed
+            # videos lose theirs
+            for junction, _ in CATEGORY_LINKS.values():
+                cursor.executemany(f'DELETE FROM {junction} WHERE video_id = ?', stale_ids)
+        
+        with phase('videos'):
+            if self.changed_videos:
+                # Only changed rows get here, so updated_at marks real changes
+                assignments = ', '.join(f'{column} = ?' for column in VIDEO_COLUMNS[1:])
+                cursor.executemany(f'''
+                    UPDATE videos SET {assignments}, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', self.changed_videos)
+            
+            cursor.executemany('DELETE FROM videos WHERE id = ?', self.removed_ids)
+            # Neighbours of changed videos wait for the next build_similar.py
+            # run, but removed videos must not be recommended
+            cursor.executemany(
+                'DELETE FROM video_similar WHERE video_id = ?1 OR similar_id = ?1', self.removed_ids
+            )
             
-            # Parse fallback/legacy logic
-            video_code_fallback, quality = extract_video_info(video_url, m3u8_url)
+            # Insert videos (without actress, genre, maker as text)
+            cursor.executemany(f'''
+                INSERT INTO videos (id, {', '.join(VIDEO_COLUMNS)})
+                VALUES ({', '.join('?' * (len(VIDEO_COLUMNS) + 1))})
+            ''', self.new_videos)
             
-            # Get values from CSV or fallback
-            video_code = row.get('code') or video_code_fallback
+            # Record release dates that did not parse, replacing older records
+            cursor.execute(
+                'DELETE FROM release_date_errors WHERE video_id IN (SELECT id FROM batch_videos)'
+            )
+            cursor.executemany(
+                'INSERT INTO release_date_errors (video_id, raw_value) VALUES (?, ?)',
+                self.date_errors
+            )
+            self.unparsed_dates += len(self.date_errors)
             
-            if m3u8_url == 'Not found':
-                m3u8_url = None
+            if self.log_changes:
+                cursor.executemany(
+                    'INSERT INTO video_changes (video_id) VALUES (?)',
+                    [(values[0],) for values in self.new_videos] + changed_ids
+                )
+                cursor.executemany(
+                    'INSERT INTO video_changes (video_id, deleted) VALUES (?, 1)', self.removed_ids
+                )
+        
+        with phase('junctions'):
+            for table, (junction, column) in CATEGORY_LINKS.items():
+                cursor.executemany(f'''
+                    INSERT OR IGNORE INTO {junction} (video_id, {column})
+                    VALUES (?, ?)
+                ''', self.links[table])
+                self.link_counts[table] += len(self.links[table])
+            record_batch_links(cursor, 1)
             
-            try:
-                # Insert video (without actress, genre, maker as text)
-                cursor.execute('''
-                    INSERT INTO videos (
-                        video_url, m3u8_url, video_code, quality,
-                        title, release_date, director, label, description, thumbnail_url
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    video_url,
-                    m3u8_url,
-                    video_code,
-                    quality,
-                    row.get('title', ''),
-                    row.get('release_date', ''),
-                    row.get('director', ''),
-                    row.get('label', ''),
-                    row.get('description', ''),
-                    row.get('thumbnail_url', '')
-                ))
-                
-                video_id = cursor.lastrowid
-                imported += 1
-                
-                # Process actresses (comma-separated)
-                actress_str = row.get('actress', '')
-                if actress_str:
-                    actresses = [a.strip() for a in actress_str.split(',') if a.strip()]
-                    for actress_name in actresses:
-                        # Insert or get actress ID
-                        cursor.execute('INSERT OR IGNORE INTO actresses (name) VALUES (?)', (actress_name,))
-                        cursor.execute('SELECT id FROM actresses WHERE name = ?', (actress_name,))
-                        actress_id = cursor.fetchone()[0]
-                        
-                        # Link video to actress
-                        cursor.execute('''
-                            INSERT OR IGNORE INTO video_actresses (video_id, actress_id) 
-                            VALUES (?, ?)
-                        ''', (video_id, actress_id))
-                        actress_count += 1
-                
-                # Process genres (comma-separated)
-                genre_str = row.get('genre', '')
-                if genre_str:
-                    genres = [g.strip() for g in genre_str.split(',') if g.strip()]
-                    for genre_name in genres:
-                        # Insert or get genre ID
-                        cursor.execute('INSERT OR IGNORE INTO genres (name) VALUES (?)', (genre_name,))
-                        cursor.execute('SELECT id FROM genres WHERE name = ?', (genre_name,))
-                        genre_id = cursor.fetchone()[0]
-                        
-                        # Link video to genre
-                        cursor.execute('''
-                            INSERT OR IGNORE INTO video_genres (video_id, genre_id) 
-                            VALUES (?, ?)
-                        ''', (video_id, genre_id))
-                        genre_count += 1
-                
-                # Process makers
-                maker_str = row.get('maker', '')
-                if maker_str:
-                    maker_name = maker_str.strip()
-                    if maker_name:
-                        # Insert or get maker ID
-                        cursor.execute('INSERT OR IGNORE INTO makers (name) VALUES (?)', (maker_name,))
-                        cursor.execute('SELECT id FROM makers WHERE name = ?', (maker_name,))
-                        maker_id = cursor.fetchone()[0]
-                        
-                        # Link video to maker
-                        cursor.execute('''
-                            INSERT OR IGNORE INTO video_makers (video_id, maker_id) 
-                            VALUES (?, ?)
-                        ''', (video_id, maker_id))
-                        maker_count += 1
-                        
-            except sqlite3.IntegrityError:
-                print(f"Skipping duplicate: {video_url}")
-                skipped += 1
+            # Names the batch's videos listed under an alias, replacing older records
+            cursor.execute('DELETE FROM alias_links WHERE video_id IN (SELECT id FROM batch_videos)')
+            cursor.executemany(
+                'INSERT OR IGNORE INTO alias_links (kind, alias, video_id) VALUES (?, ?, ?)',
+                self.alias_links
+            )
+        
+        # Refresh the tables derived from every video in this batch
+        with phase('derived'):
+            refresh_search_index(cursor, batch=True)
+            refresh_video_summary(cursor, batch=True)
+            refresh_category_stats(cursor, batch=True)
+        
+        with phase('commit'):
+            self.conn.commit()
+        self._reset_batch()
+
+
+def import_csv_to_db(csv_path, db_path='videos.db', incremental=False, bulk_session=False,
+                     workers=None, report=True):
+    """Import CSV data into SQLite database with normalized categories.
+
+    csv_path may be a single CSV, a directory of CSV shards or a glob such as
+    'video_m3u8_links*.csv'. Shards are parsed by a pool of `workers`
+    processes (one per core by default) and merged by a single writer, which
+    keeps the first row seen for each video_url.
+
+    By default the database is rebuilt from scratch. With incremental=True the
+    existing library is kept: videos are upserted by video_url, their category
+    links are replaced with the ones in the CSV, and videos missing from the
+    CSV are left untouched. Rows whose content hash matches the stored one are
+    skipped entirely, so only real changes bump updated_at.
+
+    bulk_session=True loads with BULK_PRAGMAS and, when rebuilding, without a
+    rollback journal and with index builds deferred until after the load. The
+    session ends with ANALYZE, PRAGMA optimize and the database in WAL mode,
+    which is what the client's reader expects.
+
+    Every phase is timed; with report=True the timings, throughput and peak
+    memory are also written as JSON next to the database (videos.import.json).
+    The report is returned as well.
+    """
+    csv_paths = resolve_csv_paths(csv_path)
+    if not csv_paths:
+        print(f"Error: {csv_path} not found!")
+        return
     
-    conn.commit()
+    metrics = ImportMetrics()
+    defer_indexes = bulk_session and not incremental
+    with metrics.phase('schema'):
+        conn = create_database(db_path, rebuild=not incremental, defer_indexes=defer_indexes)
+    metrics.attach(conn)
+    cursor = conn.cursor()
+    
+    if bulk_session:
+        apply_pragmas(conn, BULK_PRAGMAS)
+        # A rebuilt database has nothing to roll back to. An incremental import
+        # keeps WAL so the client can go on reading while the batch lands.
+        apply_pragmas(conn, {'journal_mode': 'WAL' if incremental else 'OFF'})
+    
+    with metrics.phase('schema'):
+        # A rebuild is logged as a whole, not video by video. It starts from
+        # (nearly) empty tables, which are cheapest to load whole; an
+        # incremental import looks up only the rows its CSV touches.
+        loader = BulkLoader(conn, metrics=metrics, log_changes=incremental, preload=not incremental)
+    
+    # Read CSV shards and import data. Records move in chunks so the timers
+    # cost nothing per row; flushes inside add() are timed as their own phases.
+    records = iter_csv_records(csv_paths, workers)
+    while True:
+        with metrics.phase('parse'):
+            chunk = list(islice(records, PARSE_CHUNK))
+        if not chunk:
+            break
+        with metrics.phase('lookups'):
+            loader.prefetch(chunk)
+        with metrics.phase('categories'):
+            for record in chunk:
+                loader.add(record)
+    
+    loader.flush()
+    
+    if bulk_session:
+        with metrics.phase('indexes'):
+            if defer_indexes:
+                create_indexes(cursor)
+    
+    # New spellings of known names were resolved while loading; this keys and
+    # merges names stored before the name_key column existed
+    with metrics.phase('aliases'):
+        merged_aliases = resolve_aliases(cursor)
+        conn.commit()
+    
+    if bulk_session:
+        with metrics.phase('analyze'):
+            cursor.execute('ANALYZE')
+            cursor.execute('PRAGMA optimize')
+            conn.commit()
+            apply_pragmas(conn, {'journal_mode': 'WAL', 'synchronous': 'NORMAL'})
+    
+    imported = loader.imported
+    updated = loader.updated
+    unchanged = loader.unchanged
+    skipped = loader.skipped
+    actress_count = loader.link_counts['actresses']
+    genre_count = loader.link_counts['genres']
+    maker_count = loader.link_counts['makers']
+    
+    import_report = metrics.report(
+        rows=imported + updated + unchanged + skipped,
+        db_path=str(db_path),
+        sources=[str(path) for path in csv_paths],
+        incremental=incremental,
+        bulk_session=bulk_session,
+        imported=imported,
+        updated=updated,
+        unchanged=unchanged,
+        skipped=skipped,
+        unparsed_release_dates=loader.unparsed_dates,
+        aliased_names=loader.aliased,
+        merged_categories=merged_aliases,
+        links=loader.link_counts,
+    )
     
     # Print summary
     try:
@@ -250,8 +1453,14 @@ def import_csv_to_db(csv_path, db_path='videos.db'):
         print("=" * 60)
         print("Import Complete!")
         print("-" * 60)
+        print(f"Source files: {len(csv_paths)}")
         print(f"Imported: {imported} new videos")
+        print(f"Updated: {updated} existing videos")
+        print(f"Unchanged: {unchanged} videos (content hash match)")
+        print(f"Unparsed release dates: {loader.unparsed_dates} (see release_date_errors)")
         print(f"Skipped: {skipped} duplicates")
+        print(f"Names resolved as aliases: {loader.aliased} "
+              f"(merged duplicates: {sum(merged_aliases.values())})")
         print(f"Total videos in database: {total_records}")
         print(f"Videos with m3u8: {with_m3u8}")
         print(f"Videos without m3u8: {total_records - with_m3u8}")
@@ -264,12 +1473,44 @@ def import_csv_to_db(csv_path, db_path='videos.db'):
         print(f"  Genre relationships: {genre_count}")
         print(f"  Maker relationships: {maker_count}")
         print()
+        print_phases(import_report)
+        print()
         print(f"Database saved to: {db_path}")
+        if report:
+            print(f"Import report saved to: {write_report(import_report, report_path_for(db_path))}")
         print("=" * 60)
     except Exception as e:
         print(f"Error printing summary: {e}")
     
     conn.close()
+    return import_report
+
+
+def delete_videos(video_urls, db_path='videos.db'):
+    """Delete videos by URL along with their links and derived rows.
+
+    Returns the number of videos that were deleted.
+    """
+    conn = create_database(db_path, rebuild=False)
+    loader = BulkLoader(conn, preload=False)
+    video_urls = list(video_urls)
+    loader.prefetch(video_urls=video_urls)
+    for video_url in video_urls:
+        loader.remove(video_url)
+    loader.flush()
+    conn.close()
+    
+    print(f"Deleted {loader.deleted} videos from {db_path}")
+    return loader.deleted
+
+
+def search_videos(query, db_path='videos.db', limit=20, offset=0):
+    """Full-text search over codes, titles, descriptions and cast.
+
+    Returns one page of matches as dictionaries, best match first.
+    """
+    with VideoRepository(db_path, pool_size=1) as repository:
+        return repository.search(query, limit, offset)
 
 
 def query_examples(db_path='videos.db'):
@@ -277,6 +1518,7 @@ def query_examples(db_path='videos.db'):
     try:
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
+        repository = VideoRepository(db_path, pool_size=1)
         
         print("\n" + "=" * 60)
         print("Example Queries with Normalized Schema:")
@@ -285,58 +1527,23 @@ def query_examples(db_path='videos.db'):
         # Example 1: Find a specific video with all categories
         print("\n1. Sample video with all categories:")
         cursor.execute('''
-            SELECT v.video_code, v.title
+            SELECT v.video_code
             FROM videos v
             LIMIT 1
         ''')
         result = cursor.fetchone()
         if result:
-            code, title = result
-            # Get actresses
-            cursor.execute('''
-                SELECT GROUP_CONCAT(a.name, ', ')
-                FROM video_actresses va
-                JOIN actresses a ON va.actress_id = a.id
-                WHERE va.video_id = (SELECT id FROM videos WHERE video_code = ?)
-            ''', (code,))
-            actresses = cursor.fetchone()[0]
-            
-            # Get genres
-            cursor.execute('''
-                SELECT GROUP_CONCAT(g.name, ', ')
-                FROM video_genres vg
-                JOIN genres g ON vg.genre_id = g.id
-                WHERE vg.video_id = (SELECT id FROM videos WHERE video_code = ?)
-            ''', (code,))
-            genres = cursor.fetchone()[0]
-            
-            # Get makers
-            cursor.execute('''
-                SELECT GROUP_CONCAT(m.name, ', ')
-                FROM video_makers vm
-                JOIN makers m ON vm.maker_id = m.id
-                WHERE vm.video_id = (SELECT id FROM videos WHERE video_code = ?)
-            ''', (code,))
-            makers = cursor.fetchone()[0]
-            
-            print(f"   Code: {code}")
-            print(f"   Title: {title[:50]}...")
-            print(f"   Actresses: {actresses}")
-            print(f"   Genres: {genres}")
-            print(f"   Makers: {makers}")
+            video = repository.by_code(result[0])
+            print(f"   Code: {video['video_code']}")
+            print(f"   Title: {video['title'][:50]}...")
+            print(f"   Actresses: {', '.join(video['actresses'])}")
+            print(f"   Genres: {', '.join(video['genres'])}")
+            print(f"   Makers: {', '.join(video['makers'])}")
         
         # Example 2: Top actresses by video count
         print("\n2. Top 5 actresses by video count:")
-        cursor.execute('''
-            SELECT a.name, COUNT(va.video_id) as video_count
-            FROM actresses a
-            JOIN video_actresses va ON a.id = va.actress_id
-            GROUP BY a.id
-            ORDER BY video_count DESC
-            LIMIT 5
-        ''')
-        for name, count in cursor.fetchall():
-            print(f"   {name}: {count} videos")
+        for actress in repository.top_categories('actress', 5):
+            print(f"   {actress['name']}: {actress['video_count']} videos")
         
         # Example 3: Filter by actress
         print("\n3. Videos by specific actress:")
@@ -344,63 +1551,76 @@ def query_examples(db_path='videos.db'):
         actress = cursor.fetchone()
         if actress:
             actress_name = actress[0]
-            cursor.execute('''
-                SELECT v.video_code, v.title
-                FROM videos v
-                JOIN video_actresses va ON v.id = va.video_id
-                JOIN actresses a ON va.actress_id = a.id
-                WHERE a.name = ?
-                LIMIT 3
-            ''', (actress_name,))
             print(f"   Videos featuring '{actress_name}':")
-            for code, title in cursor.fetchall():
-                print(f"     - {code}: {title[:45]}...")
+            for video in repository.by_actress(actress_name, limit=3):
+                print(f"     - {video['video_code']}: {video['title'][:45]}...")
         
         # Example 4: Multi-filter (genre + maker)
         print("\n4. Complex query - Videos by genre and maker:")
-        cursor.execute('''
-            SELECT v.video_code, v.title
-            FROM videos v
-            JOIN video_genres vg ON v.id = vg.video_id
-            JOIN genres g ON vg.genre_id = g.id
-            JOIN video_makers vm ON v.id = vm.video_id
-            JOIN makers m ON vm.maker_id = m.id
-            WHERE g.name = 'Creampie' AND m.name = 'Prestige'
-            LIMIT 3
-        ''')
-        results = cursor.fetchall()
+        results = repository.filter(genres=['Creampie'], makers=['Prestige'], limit=3)
         if results:
             print(f"   Videos with genre 'Creampie' and maker 'Prestige':")
-            for code, title in results:
-                print(f"     - {code}: {title[:45]}...")
+            for video in results:
+                print(f"     - {video['video_code']}: {video['title'][:45]}...")
         else:
             print("   (No matches found for this combination)")
         
         # Example 5: Top genres
         print("\n5. Top 5 genres by video count:")
+        for genre in repository.top_categories('genre', 5):
+            print(f"   {genre['name']}: {genre['video_count']} videos")
+        
+        # Example 6: Streams per resolution and per CDN host (index-only scans)
+        print("\n6. Streams by resolution and CDN host:")
         cursor.execute('''
-            SELECT g.name, COUNT(vg.video_id) as video_count
-            FROM genres g
-            JOIN video_genres vg ON g.id = vg.genre_id
-            GROUP BY g.id
-            ORDER BY video_count DESC
-            LIMIT 5
+            SELECT height, width, COUNT(*)
+            FROM videos
+            WHERE height IS NOT NULL
+            GROUP BY height, width
+            ORDER BY height DESC
         ''')
-        for name, count in cursor.fetchall():
-            print(f"   {name}: {count} videos")
+        for height, width, count in cursor.fetchall():
+            print(f"   {width or '?'}x{height}: {count} videos")
+        cursor.execute('''
+            SELECT cdn_host, COUNT(*)
+            FROM videos
+            WHERE cdn_host IS NOT NULL
+            GROUP BY cdn_host
+            ORDER BY COUNT(*) DESC
+        ''')
+        for host, count in cursor.fetchall():
+            print(f"   {host}: {count} videos")
+        
+        # Example 7: Full-text search
+        print("\n7. Full-text search for 'creampie':")
+        for result in repository.search('creampie', limit=3):
+            print(f"     - {result['video_code']}: {result['title'][:45]}...")
         
         print("=" * 60)
+        repository.close()
         conn.close()
     except Exception as e:
         print(f"Error in query examples: {e}")
 
 
 if __name__ == "__main__":
-    csv_file = "video_m3u8_links.csv"
-    db_file = "videos.db"
+    parser = argparse.ArgumentParser(description="Import scraped video CSV into SQLite")
+    parser.add_argument("csv_file", nargs="?", default="video_m3u8_links.csv",
+                        help="CSV file, directory of CSV shards or glob pattern")
+    parser.add_argument("--db", dest="db_file", default="videos.db")
+    parser.add_argument("--incremental", action="store_true",
+                        help="upsert into the existing database instead of rebuilding it")
+    parser.add_argument("--bulk", action="store_true",
+                        help="load in a bulk session: tuned pragmas and deferred index builds")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes used to parse CSV shards (default: one per core)")
+    args = parser.parse_args()
+    csv_file = args.csv_file
+    db_file = args.db_file
     
     print(f"Converting {csv_file} to SQLite database with normalized schema...")
-    import_csv_to_db(csv_file, db_file)
+    import_csv_to_db(csv_file, db_file, incremental=args.incremental, bulk_session=args.bulk,
+                     workers=args.workers)
     query_examples(db_file)
     
     print("\n" + "=" * 60)
@@ -1,49 +1,598 @@
 import sqlite3
 import json
+import argparse
+import gzip
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from pathlib import Path
 
+from video_repository import CATEGORY_KINDS, CATEGORY_NAME_VIEWS
 
-def export_db_to_json(db_path='videos.db', output_path='videos.json'):
-    """Export SQLite database to JSON for static website."""
+try:
+    import brotli
+except ImportError:
+    # Optional: without it only gzip copies are published, with a warning;
+    # the command line refuses --publish unless --no-brotli is given
+    brotli = None
+
+# JSON key -> video_summary column, in output order
+EXPORT_FIELDS = {
+    'code': 'video_code',
+    'videoUrl': 'video_url',
+    'm3u8Url': 'm3u8_url',
+    'quality': 'quality',
+    'title': 'title',
+    'releaseDate': 'release_date',
+    'actress': 'actresses',
+    'genre': 'genres',
+    'maker': 'makers',
+    'director': 'director',
+    'label': 'label',
+    'description': 'description',
+    'thumbnailUrl': 'thumbnail_url',
+}
+
+# Category lists are JSON arrays in video_summary and comma-separated
+# names in the export, as in the scraped CSV
+LIST_FIELDS = {'actress', 'genre', 'maker'}
+
+# Videos with m3u8 URLs, with their categories already aggregated per row
+EXPORT_SQL = f'''
+    SELECT video_id, {', '.join(EXPORT_FIELDS.values())}
+    FROM video_summary
+    WHERE m3u8_url IS NOT NULL {{where}}
+    ORDER BY {{order}}
+'''
+
+# Listing orders of the paged export: name -> (ORDER BY clause, JSON key
+# whose first and last values bound each page)
+PAGE_ORDERS = {
+    'recent': ('release_date DESC, video_id DESC', 'releaseDate'),
+    'code': ('video_code', 'code'),
+}
+
+# Videos per page file
+PAGE_SIZE = 50
+
+MANIFEST_NAME = 'manifest.json'
+
+# SQLite file kept next to the per-video files: the video_changes sequence
+# number they are current up to and the file written for each video id
+EXPORT_STATE_NAME = 'export-state.db'
+
+UNSAFE_FILE_CHARACTERS = re.compile(r'[^\w.-]')
+
+# Published files: logical name -> content-hashed file, next to the files
+ASSET_MANIFEST_NAME = 'assets.json'
+
+# Hex digits of the SHA-256 kept in content-hashed file names
+HASH_LENGTH = 12
+
+# Compressed copies are written next to each published file under these
+# suffixes, as served by gzip_static / brotli_static style web servers
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+
+# Bytes read at a time when publishing a large export
+PUBLISH_CHUNK = 1 << 20
+
+# Per-facet listings: export keys of each video, newest video first
+FACET_FIELDS = ('code', 'title', 'thumbnailUrl', 'releaseDate')
+
+FACET_SQL = f'''
+    SELECT j.{{column}}, {', '.join('s.' + EXPORT_FIELDS[key] for key in FACET_FIELDS)}
+    FROM {{junction}} j
+    JOIN video_summary s ON s.video_id = j.video_id
+    WHERE j.{{column}} IN (SELECT value FROM json_each(?)) AND s.m3u8_url IS NOT NULL
+    ORDER BY j.{{column}}, s.release_date DESC, s.video_id DESC
+'''
+
+# Facets are handed to the process pool in groups of about this many video
+# links; a larger facet is a task of its own
+FACET_TASK_LINKS = 20000
+
+FACET_INDEX_NAME = 'index.json'
+
+compact_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+def export_rows(conn, order='video_code', where='', params=()):
+    """Yield (video id, export object) pairs one at a time, straight from the cursor."""
+    for row in conn.execute(EXPORT_SQL.format(order=order, where=where), params):
+        video = dict(zip(EXPORT_FIELDS, row[1:]))
+        for key in LIST_FIELDS:
+            video[key] = ', '.join(json.loads(video[key]))
+        yield row[0], video
+
+
+def export_db_to_json(db_path='videos.db', output_path='videos.json', compact=False,
+                      publish=False, output_format='json', brotli_copies=True):
+    """Export SQLite database to JSON for static website.
+
+    Videos are written to the file as they are read, so memory stays flat
+    whatever the catalog size. The default output matches json.dump with
+    indent=2; compact=True drops all whitespace. publish=True renames the
+    output to a content-hashed name with compressed copies (see
+    publish_file); brotli_copies=False leaves out the brotli one.
+    output_format='packed' writes the same videos as
+    binary columns instead (see packed_export).
+    """
     conn = sqlite3.connect(db_path)
-    # Return rows as dictionaries
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Get all videos with m3u8 URLs
-    cursor.execute('''
-        SELECT *
-        FROM videos
-        WHERE m3u8_url IS NOT NULL
-        ORDER BY video_code
-    ''')
     
-    videos = []
-    for row in cursor.fetchall():
-        videos.append({
-            'code': row['video_code'],
-            'videoUrl': row['video_url'],
-            'm3u8Url': row['m3u8_url'],
-            'quality': row['quality'],
-            'title': row['title'],
-            'releaseDate': row['release_date'],
-            'actress': row['actress'],
-            'genre': row['genre'],
-            'maker': row['maker'],
-            'director': row['director'],
-            'label': row['label'],
-            'description': row['description'],
-            'thumbnailUrl': row['thumbnail_url']
-        })
-    
-    # Write to JSON file
+    if output_format == 'packed':
+        # packed_export builds on this module, so it is imported when used
+        from packed_export import write_packed
+        count = write_packed(export_rows(conn), output_path)
+        conn.close()
+        print(f"Exported {count} videos to {output_path} (packed)")
+        if publish:
+            publish_file(output_path, brotli_copies)
+        return count
+    
+    if compact:
+        encode = compact_encode
+        opening, separator, closing = '[', ',', ']'
+    else:
+        indented = json.JSONEncoder(ensure_ascii=False, indent=2).encode
+        
+        def encode(video):
+            # Nested one level inside the top-level array
+            return '  ' + indented(video).replace('\n', '\n  ')
+        
+        opening, separator, closing = '[\n', ',\n', '\n]'
+    
+    count = 0
     with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(videos, f, indent=2, ensure_ascii=False)
+        for _, video in export_rows(conn):
+            f.write(separator if count else opening)
+            f.write(encode(video))
+            count += 1
+        f.write(closing if count else '[]')
+    
+    conn.close()
+    
+    print(f"Exported {count} videos to {output_path}")
+    if publish:
+        publish_file(output_path, brotli_copies)
+    return count
+
+
+def compressed_copies(data, brotli_copies=True):
+    """Suffix -> data compressed at the highest level each format has."""
+    copies = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli_copies and brotli is not None:
+        copies['.br'] = brotli.compress(data, quality=11, lgwin=24)
+    return copies
+
+
+def warn_without_brotli(brotli_copies, what):
+    """Say so when brotli copies are wanted but the package is missing."""
+    if brotli_copies and brotli is None:
+        print(f"Warning: brotli is not installed, {what} published with gzip copies only")
+
+
+def hashed_name(name, digest):
+    """'videos.json' -> 'videos.<hash>.json'."""
+    stem, dot, suffix = name.rpartition('.')
+    return f'{stem}.{digest[:HASH_LENGTH]}.{suffix}' if dot else f'{name}.{digest[:HASH_LENGTH]}'
+
+
+def remove_published(directory, name):
+    """Delete a published file and its compressed copies."""
+    for suffix in ('',) + COMPRESSED_SUFFIXES:
+        (directory / f'{name}{suffix}').unlink(missing_ok=True)
+
+
+def publish_file(path, brotli_copies=True):
+    """Publish an exported file under a content-hashed name for caching forever.
+
+    The file is renamed to <stem>.<hash>.<suffix>, gzip and brotli copies at
+    maximum compression (gzip only with brotli_copies=False) are written
+    next to it, and assets.json in the same
+    directory maps the original name to the hashed one. The file is read
+    in chunks, so memory stays flat. The version it replaces is deleted.
+    Returns the manifest entry.
+    """
+    path = Path(path)
+    directory = path.parent
+    warn_without_brotli(brotli_copies, path.name)
+    use_brotli = brotli_copies and brotli is not None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source, \
+            open(f'{path}.gz.tmp', 'wb') as gzip_file, \
+            gzip.GzipFile(fileobj=gzip_file, mode='wb', compresslevel=9, mtime=0) as gzip_stream:
+        brotli_file = open(f'{path}.br.tmp', 'wb') if use_brotli else None
+        compressor = brotli.Compressor(quality=11, lgwin=24) if use_brotli else None
+        for chunk in iter(lambda: source.read(PUBLISH_CHUNK), b''):
+            digest.update(chunk)
+            gzip_stream.write(chunk)
+            if compressor is not None:
+                brotli_file.write(compressor.process(chunk))
+        if compressor is not None:
+            brotli_file.write(compressor.finish())
+            brotli_file.close()
+    
+    digest = digest.hexdigest()
+    name = hashed_name(path.name, digest)
+    entry = {'file': name, 'sha256': digest, 'bytes': path.stat().st_size}
+    os.replace(path, directory / name)
+    for suffix in COMPRESSED_SUFFIXES:
+        temporary_path = Path(f'{path}{suffix}.tmp')
+        if temporary_path.exists():
+            entry[f'{suffix[1:]}Bytes'] = temporary_path.stat().st_size
+            os.replace(temporary_path, directory / f'{name}{suffix}')
+    
+    manifest_path = directory / ASSET_MANIFEST_NAME
+    manifest = {}
+    if manifest_path.exists():
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    previous = manifest.get(path.name)
+    manifest[path.name] = entry
+    write_json_atomically(manifest_path, manifest)
+    if previous and previous['file'] != name:
+        remove_published(directory, previous['file'])
+    
+    print(f"Published {path.name} as {name} ({', '.join(f'{key} {value}' for key, value in entry.items() if key.endswith('Bytes'))})")
+    return entry
+
+
+def page_name(number):
+    return f'page-{number:04d}.json'
+
+
+def write_page(directory, name, videos, publish=False, brotli_copies=True):
+    """Write one compact page file and return its manifest fields.
+
+    With publish=True the name gets the content hash and compressed copies
+    are written next to the page.
+    """
+    data = ('[' + ','.join(map(compact_encode, videos)) + ']').encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    entry = {'sha256': digest, 'bytes': len(data)}
+    if publish:
+        name = hashed_name(name, digest)
+        for suffix, compressed in compressed_copies(data, brotli_copies).items():
+            with open(directory / f'{name}{suffix}', 'wb') as f:
+                f.write(compressed)
+            entry[f'{suffix[1:]}Bytes'] = len(compressed)
+    with open(directory / name, 'wb') as f:
+        f.write(data)
+    return name, entry
+
+
+def export_pages(db_path='videos.db', output_dir='videos', page_size=PAGE_SIZE, publish=False,
+                 brotli_copies=True):
+    """Export the catalog as fixed-size pages in every listing order.
+
+    output_dir/<order>/page-0001.json holds the first page_size videos of
+    that order (see PAGE_ORDERS), so the first screen is one small static
+    file. output_dir/manifest.json lists every page with its video count,
+    first and last sort key and SHA-256. Pages left over from a larger
+    earlier export are deleted. Returns the number of videos exported.
+    
+    With publish=True pages are named page-0001.<hash>.json and get gzip
+    and brotli copies (gzip only with brotli_copies=False), so they can be
+    cached forever; the manifest, the one file to revalidate, gets
+    compressed copies too.
+    """
+    output_dir = Path(output_dir)
+    if publish:
+        warn_without_brotli(brotli_copies, 'pages are')
+    conn = sqlite3.connect(db_path)
+    
+    manifest = {'pageSize': page_size, 'total': 0, 'orders': {}}
+    for order, (order_by, sort_key) in PAGE_ORDERS.items():
+        order_dir = output_dir / order
+        order_dir.mkdir(parents=True, exist_ok=True)
+        pages = []
+        
+        def flush(videos):
+            name, entry = write_page(order_dir, page_name(len(pages) + 1), videos, publish,
+                                     brotli_copies)
+            pages.append({
+                'file': f'{order}/{name}',
+                'count': len(videos),
+                'first': videos[0][sort_key],
+                'last': videos[-1][sort_key],
+                **entry,
+            })
+        
+        # Only one page of videos is held in memory at a time
+        videos = []
+        total = 0
+        for _, video in export_rows(conn, order_by):
+            videos.append(video)
+            total += 1
+            if len(videos) == page_size:
+                flush(videos)
+                videos = []
+        if videos:
+            flush(videos)
+        
+        written = {
+            Path(page['file']).name + suffix
+            for page in pages
+            for suffix in ('',) + (COMPRESSED_SUFFIXES if publish else ())
+        }
+        for path in order_dir.glob('page-*'):
+            if path.name not in written:
+                path.unlink()
+        
+        manifest['total'] = total
+        manifest['orders'][order] = {'sortKey': sort_key, 'pages': pages}
+    conn.close()
+    
+    # Replace the manifest last, so it never lists pages not yet written
+    manifest_path = output_dir / MANIFEST_NAME
+    write_json_atomically(manifest_path, manifest)
+    if publish:
+        data = manifest_path.read_bytes()
+        for suffix, compressed in compressed_copies(data, brotli_copies).items():
+            with open(f'{manifest_path}{suffix}', 'wb') as f:
+                f.write(compressed)
+    
+    page_count = sum(len(entry['pages']) for entry in manifest['orders'].values())
+    print(f"Exported {manifest['total']} videos as {page_count} pages to {output_dir}")
+    return manifest['total']
+
+
+def write_json_atomically(path, data):
+    """Write JSON next to path and swap it in, so readers never see half a file."""
+    temporary_path = Path(path).with_suffix('.tmp')
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temporary_path, path)
+
+
+def video_file_name(video):
+    return UNSAFE_FILE_CHARACTERS.sub('_', video['code'] or '') + '.json'
+
+
+def open_export_state(path):
+    """Open (creating if needed) the state database of a per-video export."""
+    state = sqlite3.connect(path)
+    state.execute('CREATE TABLE IF NOT EXISTS watermark (seq INTEGER NOT NULL)')
+    state.execute('''
+        CREATE TABLE IF NOT EXISTS files (
+            video_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL
+        )
+    ''')
+    state.execute('CREATE INDEX IF NOT EXISTS idx_files_name ON files(name)')
+    return state
+
+
+def read_changes(conn, watermark):
+    """Return (latest sequence number, ids of videos changed after watermark).
+
+    The ids are None when everything has to be exported again: the library
+    was rebuilt since, or the database has no change log.
+    """
+    try:
+        latest = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM video_changes').fetchone()[0]
+        changes = conn.execute(
+            'SELECT video_id FROM video_changes WHERE seq > ? AND seq <= ?', (watermark, latest)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return 0, None
+    if any(video_id is None for video_id, in changes):
+        return latest, None
+    return latest, {video_id for video_id, in changes}
+
+
+def export_videos(db_path='videos.db', output_dir='videos', full=False):
+    """Export one JSON file per video (output_dir/<code>.json), incrementally.
+
+    The position in the importer's video_changes log and the file of each
+    video id are kept in the export-state.db SQLite file, updated only for
+    the videos a run touches. Later runs only rewrite the files of videos
+    logged since then, which covers new, updated and re-linked videos, and
+    delete the files of removed videos. A rebuilt library, a missing state
+    or full=True exports everything and removes files no video uses.
+    Returns (files written, files deleted).
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    state = open_export_state(output_dir / EXPORT_STATE_NAME)
+    watermark = None if full else state.execute('SELECT seq FROM watermark').fetchone()
     
+    conn = sqlite3.connect(db_path)
+    latest, changed = read_changes(conn, watermark[0] if watermark else 0)
+    incremental = watermark is not None and changed is not None
+    if incremental:
+        where = 'AND video_id IN (SELECT value FROM json_each(?))'
+        params = (json.dumps(sorted(changed)),)
+    else:
+        state.execute('DELETE FROM files')
+        where, params = '', ()
+    
+    written = 0
+    exported = set()
+    stale = set()
+    for video_id, video in export_rows(conn, 'video_id', where, params):
+        name = video_file_name(video)
+        with open(output_dir / name, 'w', encoding='utf-8') as f:
+            f.write(compact_encode(video))
+        written += 1
+        exported.add(video_id)
+        previous = state.execute('SELECT name FROM files WHERE video_id = ?', (video_id,)).fetchone()
+        if previous and previous[0] != name:
+            stale.add(previous[0])
+        state.execute('INSERT OR REPLACE INTO files (video_id, name) VALUES (?, ?)', (video_id, name))
+    conn.close()
+    
+    if incremental:
+        # Logged videos that are no longer exported: deleted, or without a stream
+        for video_id in changed - exported:
+            previous = state.execute('SELECT name FROM files WHERE video_id = ?', (video_id,)).fetchone()
+            if previous:
+                stale.add(previous[0])
+                state.execute('DELETE FROM files WHERE video_id = ?', (video_id,))
+    else:
+        # Also removes the export-state.json of older exports
+        stale = {path.name for path in output_dir.glob('*.json')}
+    
+    # Videos sharing a code share a file
+    stale = {name for name in stale
+             if state.execute('SELECT 1 FROM files WHERE name = ?', (name,)).fetchone() is None}
+    for name in stale:
+        (output_dir / name).unlink(missing_ok=True)
+    
+    state.execute('DELETE FROM watermark')
+    state.execute('INSERT INTO watermark (seq) VALUES (?)', (latest,))
+    state.commit()
+    state.close()
+    print(f"Exported {written} videos to {output_dir} ({'changes only' if incremental else 'full'}), "
+          f"deleted {len(stale)} files")
+    return written, len(stale)
+
+
+def export_facet_task(task):
+    """Write the listing files of a group of facets of one kind.
+
+    Runs inside the export process pool, on its own read-only connection.
+    Returns (facet name, index entry) pairs.
+    """
+    db_path, output_dir, kind, facets = task
+    _, junction, column, _ = CATEGORY_KINDS[kind]
+    names = dict(facets)
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    rows = conn.execute(FACET_SQL.format(junction=junction, column=column),
+                        (json.dumps(list(names)),))
+    entries = []
+    for category_id, videos in groupby(rows, key=lambda row: row[0]):
+        videos = [list(video[1:]) for video in videos]
+        name = f'{kind}/{category_id}.json'
+        with open(Path(output_dir) / name, 'w', encoding='utf-8') as f:
+            f.write(compact_encode({'name': names[category_id], 'count': len(videos), 'videos': videos}))
+        entries.append((names[category_id], {
+            'file': name,
+            'count': len(videos),
+            'latest': videos[0][FACET_FIELDS.index('releaseDate')],
+        }))
+    conn.close()
+    return entries
+
+
+def export_facets(db_path='videos.db', output_dir='facets', workers=None):
+    """Export a listing file for every actress, genre and maker.
+
+    output_dir/<kind>/<id>.json holds the code, title, thumbnail and release
+    date of every video of that facet, newest first, so a facet page is one
+    static file and no join. output_dir/index.json maps every facet name,
+    and every merged spelling of it, to its file and video count. Files are
+    written by a pool of `workers` processes; facets without exported
+    videos get none, and files of removed facets are deleted. Returns the
+    number of facet files written.
+    """
+    output_dir = Path(output_dir)
+    conn = sqlite3.connect(db_path)
+    tasks = []
+    aliases = {}
+    for kind, (table, junction, column, _) in CATEGORY_KINDS.items():
+        (output_dir / kind).mkdir(parents=True, exist_ok=True)
+        counts = dict(conn.execute(f'SELECT {column}, COUNT(*) FROM {junction} GROUP BY {column}'))
+        facets, links = [], 0
+        for category_id, name in conn.execute(f'SELECT id, name FROM {table} ORDER BY id'):
+            count = counts.get(category_id, 0)
+            if not count:
+                continue
+            if facets and links + count > FACET_TASK_LINKS:
+                tasks.append((db_path, str(output_dir), kind, facets))
+                facets, links = [], 0
+            facets.append((category_id, name))
+            links += count
+        if facets:
+            tasks.append((db_path, str(output_dir), kind, facets))
+        
+        aliases[kind] = []
+        if kind in CATEGORY_NAME_VIEWS:
+            aliases[kind] = conn.execute(f'''
+                SELECT n.name, c.name FROM {CATEGORY_NAME_VIEWS[kind]} n
+                JOIN {table} c ON c.id = n.id
+                WHERE n.name != c.name
+            ''').fetchall()
     conn.close()
     
-    print(f"Exported {len(videos)} videos to {output_path}")
-    return len(videos)
+    if len(tasks) <= 1 or workers == 1:
+        results = map(export_facet_task, tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(export_facet_task, tasks)
+    
+    index = {
+        'fields': FACET_FIELDS,
+        'kinds': {kind: {'facets': {}, 'aliases': {}} for kind in CATEGORY_KINDS},
+    }
+    try:
+        for (_, _, kind, _), entries in zip(tasks, results):
+            index['kinds'][kind]['facets'].update(entries)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    written = 0
+    for kind, kind_index in index['kinds'].items():
+        facets = kind_index['facets']
+        kind_index['aliases'] = {alias: name for alias, name in aliases[kind] if name in facets}
+        files = {Path(entry['file']).name for entry in facets.values()}
+        for path in (output_dir / kind).glob('*.json'):
+            if path.name not in files:
+                path.unlink()
+        written += len(facets)
+    
+    # Replace the index last, so it never lists files not yet written
+    write_json_atomically(output_dir / FACET_INDEX_NAME, index)
+    counts = ', '.join(f"{len(kind_index['facets'])} {kind}" for kind, kind_index in index['kinds'].items())
+    print(f"Exported {written} facet listings to {output_dir} ({counts})")
+    return written
 
 
 if __name__ == "__main__":
-    export_db_to_json()
+    parser = argparse.ArgumentParser(description="Export the video database to JSON")
+    parser.add_argument("--db", dest="db_file", default="videos.db")
+    parser.add_argument("--output", default=None, help="videos.json, or videos.pack when packed")
+    parser.add_argument("--compact", action="store_true", help="write without indentation")
+    parser.add_argument("--format", choices=["json", "packed"], default="json",
+                        help="packed: binary columns with string dictionaries, see packed_export")
+    parser.add_argument("--pages", metavar="DIR", default=None,
+                        help="write fixed-size pages and a manifest to DIR instead of one file")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--videos", metavar="DIR", default=None,
+                        help="write one file per video to DIR, rewriting only changed videos")
+    parser.add_argument("--full", action="store_true", help="with --videos, export every video again")
+    parser.add_argument("--publish", action="store_true",
+                        help="content-hash file names and write gzip and brotli copies")
+    parser.add_argument("--no-brotli", action="store_true",
+                        help="with --publish, write gzip copies only")
+    parser.add_argument("--search", metavar="DIR", default=None,
+                        help="also write a sharded search index to DIR for static search")
+    parser.add_argument("--facets", metavar="DIR", default=None,
+                        help="also write a listing file per actress, genre and maker to DIR")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes writing the facet listings (default: one per CPU)")
+    args = parser.parse_args()
+    if args.publish and brotli is None and not args.no_brotli:
+        parser.error("--publish writes brotli copies, which needs the brotli package; "
+                     "install it or pass --no-brotli")
+    
+    if args.pages:
+        export_pages(args.db_file, args.pages, args.page_size, publish=args.publish,
+                     brotli_copies=not args.no_brotli)
+    elif args.videos:
+        export_videos(args.db_file, args.videos, full=args.full)
+    else:
+        output = args.output or ('videos.pack' if args.format == 'packed' else 'videos.json')
+        export_db_to_json(args.db_file, output, compact=args.compact, publish=args.publish,
+                          output_format=args.format, brotli_copies=not args.no_brotli)
+    
+    if args.search:
+        # search_index builds on this module, so it is imported when used
+        from search_index import export_search_index
+        export_search_index(args.db_file, args.search)
+    if args.facets:
+        export_facets(args.db_file, args.facets, workers=args.workers)
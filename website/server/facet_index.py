@@ -0,0 +1,444 @@
+import heapq
+import json
+import re
+import sqlite3
+from array import array
+from collections import Counter, OrderedDict
+from itertools import accumulate, chain
+
+from categories import ALIASED_KINDS, CATEGORY_KINDS
+
+# Values linked to at least this share of the catalog are kept as bitmaps
+# (one bit per video id); rarer values are kept as sets of video ids, which
+# are smaller than a bitmap until roughly 1 video in 300 carries the value.
+DENSE_FRACTION = 1 / 256
+
+# Rough costs used by FacetIndex.prefer_tally to pick a counting strategy:
+# per video when tallying links, per catalog video when intersecting a
+# bitmap, per id when probing a set
+TALLY_COST = 1.0
+BITMAP_COST = 0.0001
+PROBE_COST = 0.15
+
+# Facet kind -> (category table, junction table, junction column)
+FACET_KINDS = {kind: (table, junction, column) for kind, (table, junction, column, _) in CATEGORY_KINDS.items()}
+
+# Alias tables of the kinds whose other spellings are merged by the importer
+FACET_ALIASES = {kind: aliases for kind, (aliases, _) in ALIASED_KINDS.items()}
+
+# facet_counts() results kept per expression until the next load or refresh
+COUNT_CACHE_SIZE = 256
+
+NONZERO_BYTE = re.compile(rb'[^\x00]')
+
+# Bit positions set in each byte value
+BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+class Bitmap:
+    """A set of video ids stored as the bits of an int."""
+    
+    __slots__ = ('bits', '_data', '_size')
+    
+    def __init__(self, bits):
+        self.bits = bits
+        self._data = None
+        self._size = None
+    
+    @classmethod
+    def from_ids(cls, ids):
+        data = bytearray((max(ids, default=0) >> 3) + 1)
+        for video_id in ids:
+            data[video_id >> 3] |= 1 << (video_id & 7)
+        return cls(int.from_bytes(data, 'little'))
+    
+    def __len__(self):
+        if self._size is None:
+            self._size = self.bits.bit_count()
+        return self._size
+    
+    @property
+    def data(self):
+        """The bits as little-endian bytes. Bit tests on these are O(1);
+        shifting the int is not."""
+        if self._data is None:
+            self._data = self.bits.to_bytes((self.bits.bit_length() + 7) // 8, 'little')
+        return self._data
+    
+    def __contains__(self, video_id):
+        data = self.data
+        index = video_id >> 3
+        return index < len(data) and data[index] >> (video_id & 7) & 1 == 1
+    
+    def members(self, ids):
+        """The given ids that are in the bitmap, as a list."""
+        data = self.data
+        try:
+            return [video_id for video_id in ids if data[video_id >> 3] >> (video_id & 7) & 1]
+        except IndexError:
+            # Some id is past the last set bit
+            return [video_id for video_id in ids if video_id in self]
+    
+    def __iter__(self):
+        data = self.bits.to_bytes((self.bits.bit_length() + 7) // 8, 'little')
+        for match in NONZERO_BYTE.finditer(data):
+            base = match.start() << 3
+            for bit in BYTE_BITS[data[match.start()]]:
+                yield base + bit
+
+
+def to_bits(ids):
+    return ids.bits if isinstance(ids, Bitmap) else Bitmap.from_ids(ids).bits
+
+
+def intersect(a, b):
+    if isinstance(a, Bitmap) and isinstance(b, Bitmap):
+        return Bitmap(a.bits & b.bits)
+    if isinstance(a, frozenset) and isinstance(b, frozenset):
+        return a & b
+    if isinstance(a, Bitmap):
+        a, b = b, a
+    return frozenset(b.members(a))
+
+
+def union(a, b):
+    if isinstance(a, frozenset) and isinstance(b, frozenset):
+        return a | b
+    return Bitmap(to_bits(a) | to_bits(b))
+
+
+def difference(a, b):
+    if isinstance(a, frozenset) and isinstance(b, frozenset):
+        return a - b
+    if isinstance(a, frozenset):
+        return a.difference(b.members(a))
+    return Bitmap(a.bits & ~to_bits(b))
+
+
+class FacetIndex:
+    """In-memory posting sets of video ids per actress, genre and maker.
+
+    Filters are boolean expressions built from tuples:
+
+        ('genre', 'Creampie')                     videos with a value
+        ('and', expr, ...) / ('or', expr, ...)    intersection / union
+        ('not', expr)                             complement
+
+    so ('and', ('genre', 'Creampie'), ('or', ('maker', 'S1'), ('maker', 'SOD')))
+    is answered with a few set operations and no SQL. Common values are
+    bitmaps and rare ones plain id sets (see DENSE_FRACTION).
+
+    Changes are picked up from the video_changes log the importer writes, so
+    refresh() after an import only touches the videos that changed.
+    """
+    
+    def __init__(self, db_path='videos.db', dense_fraction=DENSE_FRACTION):
+        self.db_path = db_path
+        self.dense_fraction = dense_fraction
+        self.conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, check_same_thread=False)
+        self.load()
+    
+    def close(self):
+        self.conn.close()
+    
+    def _last_change(self):
+        try:
+            return self.conn.execute('SELECT COALESCE(MAX(seq), 0) FROM video_changes').fetchone()[0]
+        except sqlite3.OperationalError:
+            # Database written before the change log existed
+            return 0
+    
+    def _aliases(self, kind):
+        """Merged spelling -> category id, for kinds with an alias table."""
+        if kind not in FACET_ALIASES:
+            return {}
+        column = FACET_KINDS[kind][2]
+        try:
+            return dict(self.conn.execute(f'SELECT alias, {column} FROM {FACET_ALIASES[kind]}'))
+        except sqlite3.OperationalError:
+            # Database written before aliases were merged
+            return {}
+    
+    def load(self):
+        """(Re)build every posting set from the junction tables."""
+        conn = self.conn
+        self.watermark = self._last_change()
+        self.video_ids = Bitmap.from_ids([row[0] for row in conn.execute('SELECT id FROM videos')])
+        self.names = {}
+        self.name_ids = {}
+        self.postings = {}
+        self.forward = {}
+        self.changed_links = {}
+        self._ranked = None
+        self._count_cache = OrderedDict()
+        
+        dense_size = max(1, int(len(self.video_ids) * self.dense_fraction))
+        for kind, (table, junction, column) in FACET_KINDS.items():
+            self.names[kind] = dict(conn.execute(f'SELECT id, name FROM {table}'))
+            self.name_ids[kind] = {name: category_id for category_id, name in self.names[kind].items()}
+            self.name_ids[kind].update(self._aliases(kind))
+            
+            # The junction primary key orders links by video, which yields both
+            # the per-value postings and a compact per-video link list
+            lists = {}
+            offsets = array('I', [0])
+            links = array('I')
+            last_video = 0
+            for video_id, category_id in conn.execute(
+                f'SELECT video_id, {column} FROM {junction} ORDER BY video_id, {column}'
+            ):
+                if video_id != last_video:
+                    offsets.extend([len(links)] * (video_id - last_video))
+                    last_video = video_id
+                links.append(category_id)
+                ids = lists.get(category_id)
+                if ids is None:
+                    ids = lists[category_id] = array('I')
+                ids.append(video_id)
+            offsets.append(len(links))
+            
+            self.postings[kind] = {
+                category_id: Bitmap.from_ids(ids) if len(ids) >= dense_size else frozenset(ids)
+                for category_id, ids in lists.items()
+            }
+            self.forward[kind] = (offsets, links)
+            self.changed_links[kind] = {}
+    
+    def refresh(self):
+        """Apply the videos logged in video_changes since the last load or refresh.
+
+        Returns the number of videos re-indexed. A rebuilt database (logged as
+        a change without a video id) is reloaded in full.
+        """
+        conn = self.conn
+        watermark = self.watermark
+        try:
+            changes = conn.execute(
+                'SELECT seq, video_id, deleted FROM video_changes WHERE seq > ? ORDER BY seq',
+                (watermark,)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            changes = []
+        if not changes:
+            return 0
+        
+        changed = {}
+        for _, video_id, is_deleted in changes:
+            if video_id is None:
+                self.load()
+                return len(self.video_ids)
+            changed[video_id] = bool(is_deleted)
+        
+        live = [video_id for video_id, is_deleted in changed.items() if not is_deleted]
+        self.video_ids = Bitmap(
+            (self.video_ids.bits & ~Bitmap.from_ids(changed).bits) | to_bits(live)
+        )
+        dense_size = max(1, int(len(self.video_ids) * self.dense_fraction))
+        
+        for kind, (table, junction, column) in FACET_KINDS.items():
+            names = self.names[kind]
+            for category_id, name in conn.execute(
+                f'SELECT id, name FROM {table} WHERE id > ?', (max(names, default=0),)
+            ):
+                names[category_id] = name
+                self.name_ids[kind][name] = category_id
+            # Merging categories turns names into aliases of other ones
+            self.name_ids[kind].update(self._aliases(kind))
+            
+            new_links = {video_id: [] for video_id in live}
+            for video_id, category_id in conn.execute(f'''
+                SELECT video_id, {column} FROM {junction}
+                WHERE video_id IN (SELECT value FROM json_each(?))
+            ''', (json.dumps(live),)):
+                new_links[video_id].append(category_id)
+            
+            # Collect every posting change first so each set is rebuilt once
+            removed, added = {}, {}
+            for video_id in changed:
+                for category_id in self.links_of(kind, video_id):
+                    removed.setdefault(category_id, []).append(video_id)
+            for video_id, category_ids in new_links.items():
+                for category_id in category_ids:
+                    added.setdefault(category_id, []).append(video_id)
+            
+            postings = self.postings[kind]
+            for category_id in removed.keys() | added.keys():
+                ids = postings.get(category_id, frozenset())
+                ids = difference(ids, frozenset(removed.get(category_id, ())))
+                ids = union(ids, frozenset(added.get(category_id, ())))
+                if isinstance(ids, frozenset) and len(ids) >= dense_size:
+                    ids = Bitmap.from_ids(ids)
+                if len(ids):
+                    postings[category_id] = ids
+                else:
+                    postings.pop(category_id, None)
+            
+            overlay = self.changed_links[kind]
+            for video_id in changed:
+                overlay[video_id] = tuple(new_links.get(video_id, ()))
+        
+        self.watermark = changes[-1][0]
+        self._ranked = None
+        self._count_cache.clear()
+        return len(changed)
+    
+    def links_of(self, kind, video_id):
+        """Category ids of one kind linked to a video."""
+        changed = self.changed_links[kind].get(video_id)
+        if changed is not None:
+            return changed
+        offsets, links = self.forward[kind]
+        if video_id + 1 >= len(offsets):
+            return ()
+        return links[offsets[video_id]:offsets[video_id + 1]]
+    
+    def tally(self, kind, video_ids):
+        """Counter of the category ids of a kind linked to the given videos."""
+        if self.changed_links[kind]:
+            return Counter(chain.from_iterable(
+                self.links_of(kind, video_id) for video_id in video_ids
+            ))
+        # Straight off the link arrays while nothing has been refreshed
+        offsets, links = self.forward[kind]
+        end = len(offsets) - 1
+        return Counter(chain.from_iterable(
+            links[offsets[video_id]:offsets[video_id + 1]]
+            for video_id in video_ids if video_id < end
+        ))
+    
+    def select(self, expression):
+        """Video ids matching an expression, as a frozenset or Bitmap."""
+        op = expression[0]
+        if op in FACET_KINDS:
+            category_id = self.name_ids[op].get(expression[1])
+            return self.postings[op].get(category_id, frozenset())
+        if op == 'not':
+            return difference(self.video_ids, self.select(expression[1]))
+        if op == 'or':
+            result = frozenset()
+            for operand in expression[1:]:
+                result = union(result, self.select(operand))
+            return result
+        if op == 'and':
+            # Intersect the smallest sets first and subtract negations last
+            positive = [self.select(operand) for operand in expression[1:] if operand[0] != 'not']
+            negative = [self.select(operand[1]) for operand in expression[1:] if operand[0] == 'not']
+            if not positive:
+                positive = [self.video_ids]
+            positive.sort(key=len)
+            result = positive[0]
+            for ids in positive[1:]:
+                if not result:
+                    break
+                result = intersect(result, ids)
+            for ids in negative:
+                result = difference(result, ids)
+            return result
+        raise ValueError(f"Unknown facet expression: {expression!r}")
+    
+    def count(self, expression):
+        """Number of videos matching an expression."""
+        return len(self.select(expression))
+    
+    def ranked(self, kind):
+        """(video count, category id, ids) of every value of a kind, most used first.
+
+        Ties are ordered by category id, here and in every count listing.
+        """
+        if self._ranked is None:
+            self._ranked = {
+                kind: sorted(
+                    ((len(ids), category_id, ids) for category_id, ids in postings.items()),
+                    key=lambda entry: (-entry[0], entry[1])
+                )
+                for kind, postings in self.postings.items()
+            }
+            # Estimated cost of counting the first n values against a result
+            span = self.video_ids.bits.bit_length()
+            self._scan_costs = {
+                kind: list(accumulate(
+                    (BITMAP_COST * span if isinstance(ids, Bitmap) else PROBE_COST * total
+                     for total, _, ids in ranked),
+                    initial=0
+                ))
+                for kind, ranked in self._ranked.items()
+            }
+        return self._ranked[kind]
+    
+    def prefer_tally(self, kind, result, limit):
+        """Whether tallying result's links is cheaper than top_counts() for a kind.
+
+        Assumes values are spread evenly, so the top counts within a result
+        are the catalog counts scaled by the result's share of the catalog.
+        """
+        ranked = self.ranked(kind)
+        if len(ranked) <= limit:
+            scanned = len(ranked)
+        else:
+            share = len(result) / max(1, len(self.video_ids))
+            floor = ranked[limit - 1][0] * share
+            scanned = limit
+            while scanned < len(ranked) and ranked[scanned][0] > floor:
+                scanned = min(len(ranked), scanned * 2)
+        return TALLY_COST * len(result) < self._scan_costs[kind][scanned]
+    
+    def top_counts(self, kind, result, limit):
+        """Exact top `limit` (count, category id) pairs of a kind within result.
+
+        Values are visited most used first, and a value can match at most as
+        many videos as it has overall, so the scan stops as soon as no
+        remaining value can beat the current top `limit`.
+        """
+        top = []
+        bits = None
+        for total, category_id, ids in self.ranked(kind):
+            if len(top) == limit and total <= top[0][0]:
+                break
+            if isinstance(ids, Bitmap):
+                if bits is None:
+                    bits = to_bits(result)
+                count = (bits & ids.bits).bit_count()
+            elif isinstance(result, Bitmap):
+                count = len(result.members(ids))
+            else:
+                count = len(ids & result)
+            # Heap of (count, -category_id): the weakest entry is on top
+            entry = (count, -category_id)
+            if len(top) < limit:
+                heapq.heappush(top, entry)
+            elif entry > top[0]:
+                heapq.heapreplace(top, entry)
+        return [(count, -negated_id) for count, negated_id in sorted(top, reverse=True)]
+    
+    def facet_counts(self, expression=None, kinds=tuple(FACET_KINDS), limit=10):
+        """Top values of each kind within the videos matching an expression.
+
+        Returns {kind: [(name, count), ...]}, largest count first. Without an
+        expression the whole catalog is counted. Results are cached per
+        expression until the index changes.
+        """
+        key = (expression, tuple(kinds), limit)
+        counts = self._count_cache.get(key)
+        if counts is not None:
+            self._count_cache.move_to_end(key)
+            return counts
+        
+        counts = {}
+        result = self.select(expression) if expression is not None else None
+        for kind in kinds:
+            if result is None:
+                top = [(total, category_id) for total, category_id, _ in self.ranked(kind)[:limit]]
+            elif self.prefer_tally(kind, result, limit):
+                # Few videos: tallying their links beats probing the values
+                tally = self.tally(kind, result)
+                top = heapq.nsmallest(limit, ((count, category_id) for category_id, count in tally.items()),
+                                      key=lambda pair: (-pair[0], pair[1]))
+            else:
+                top = self.top_counts(kind, result, limit)
+            names = self.names[kind]
+            counts[kind] = [(names[category_id], count) for count, category_id in top if count]
+        
+        self._count_cache[key] = counts
+        if len(self._count_cache) > COUNT_CACHE_SIZE:
+            self._count_cache.popitem(last=False)
+        return counts
@@ -0,0 +1,174 @@
+import argparse
+import csv
+import random
+import uuid
+from datetime import date, timedelta
+from itertools import accumulate
+
+# Same columns as the scraper output read by csv_to_sqlite.py
+CSV_COLUMNS = [
+    'video_url', 'm3u8_url', 'title', 'code', 'release_date', 'actress',
+    'genre', 'maker', 'director', 'label', 'description', 'thumbnail_url'
+]
+
+# Preset sizes for benchmarks
+CATALOG_SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+# Most common genres of the scraped library, most frequent first
+GENRES = [
+    'Hd', 'Exclusive', 'Individual', 'Big Breasts', 'Creampie', '4K', 'Ntr',
+    'Extreme Orgasm', 'Tit Job', 'Promiscuous', 'High School Girl', 'Slim Pixelated',
+    'Ride', 'Slim', 'Plot', 'Collection', 'Ordinary Person', 'Oral Sex', 'Slut',
+    'Pretty Girl', 'Uniform', 'Wife', '4 Hours Or More', 'Documentary', 'Orgy', 'Kiss',
+    'Full Hd (Fhd)', 'Sister', 'Forced Blowjob', 'Humiliation', 'Harem', 'Promiscuity',
+    'Thanks Offering', 'Ultra Slim Pixelated', 'Delivery Only', 'Squirting', 'Original',
+    'Incest', 'Artist', 'Shame', 'Ol', 'Butt Fetish', 'Elder Sister', 'Hot Girl',
+    'Planning', 'Tall Lady', 'Asian Actress', 'Debut', 'Mature Woman', 'Doggy Style',
+    'Big Ass', 'Mother', 'Toy', 'Anus', 'G Cup', 'Subordinate Or Colleague',
+    'Outdoor Exposure', '69', 'Fingering', 'Sorority',
+]
+
+MAKERS = [
+    'S1', "Moody's", 'SOD', 'IdeaPocket', 'FALENO', 'Wanz Factory', 'kawaii', 'Premium',
+    'ROCKET', 'Prestige', 'Hunter', 'Madonna', 'NATURAL HIGH', 'OPPAI', 'Sadistic Village',
+    'VERONICA', 'ドキュメンTV', '溜池ゴロー', '素人ペイペイ', 'ロケット',
+]
+
+NAME_SYLLABLES = [
+    'a', 'ai', 'ka', 'ki', 'ko', 'mi', 'mo', 'na', 'no', 'ri', 'ru', 'sa', 'shi',
+    'su', 'ta', 'to', 'yu', 'yo', 'ha', 'hi', 'ma', 'me', 'ne', 'ra', 're', 'ze',
+]
+
+TITLE_WORDS = [
+    'secret', 'office', 'summer', 'lesson', 'neighbor', 'weekend', 'hotel', 'night',
+    'temptation', 'reunion', 'trip', 'teacher', 'rainy', 'day', 'first', 'last',
+    'married', 'boss', 'sister', 'memories', 'record', 'special', 'countryside', 'love',
+]
+
+# Share of rows whose stream could not be resolved by the scraper
+MISSING_M3U8_RATE = 0.03
+
+FIRST_RELEASE = date(2010, 1, 1)
+RELEASE_SPAN_DAYS = 16 * 365
+
+
+def zipf_weights(count, exponent=1.0):
+    """Cumulative weights of a Zipf distribution: a few names dominate the catalog."""
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def make_name(rng):
+    """A romanized two-part name such as 'Kasumi Tsukino'."""
+    def part(syllables):
+        return ''.join(rng.choice(NAME_SYLLABLES) for _ in range(syllables)).capitalize()
+    return f'{part(rng.randint(2, 3))} {part(rng.randint(2, 4))}'
+
+
+def make_names(rng, count):
+    names = {}
+    while len(names) < count:
+        names.setdefault(make_name(rng), None)
+    return list(names)
+
+
+def cast_size(rng):
+    """Actresses per video: mostly solo titles with a long tail of compilations."""
+    roll = rng.random()
+    if roll < 0.70:
+        return 1
+    if roll < 0.90:
+        return rng.randint(2, 4)
+    if roll < 0.97:
+        return 0
+    return rng.randint(8, 55)
+
+
+def sample_distinct(rng, population, cum_weights, count):
+    """Up to `count` distinct weighted picks, in pick order."""
+    picked = dict.fromkeys(rng.choices(population, cum_weights=cum_weights, k=count * 2))
+    return list(picked)[:count]
+
+
+def generate_rows(rows, seed=0):
+    """Yield `rows` synthetic CSV rows; the same seed always yields the same catalog."""
+    rng = random.Random(seed)
+    
+    # The cast pool grows with the catalog, as it does in production
+    actresses = make_names(rng, max(50, rows // 8))
+    directors = make_names(rng, max(20, rows // 200))
+    actress_weights = zipf_weights(len(actresses), 0.9)
+    genre_weights = zipf_weights(len(GENRES), 0.8)
+    maker_weights = zipf_weights(len(MAKERS), 1.1)
+    
+    # Every maker publishes under a few labels, each with its own code prefix
+    labels = {
+        maker: [
+            ''.join(rng.choice('ABCDEFGHJKMNPRSTVWX') for _ in range(rng.randint(3, 4)))
+            for _ in range(rng.randint(1, 4))
+        ]
+        for maker in MAKERS
+    }
+    next_number = {}
+    
+    for _ in range(rows):
+        maker = rng.choices(MAKERS, cum_weights=maker_weights)[0]
+        prefix = rng.choice(labels[maker])
+        number = next_number[prefix] = next_number.get(prefix, 0) + 1
+        code = f'{prefix}-{number:03d}'
+        slug = code.lower()
+        
+        cast = sample_distinct(rng, actresses, actress_weights, cast_size(rng))
+        genres = sample_distinct(rng, GENRES, genre_weights, rng.randint(2, 8))
+        title_words = ' '.join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(4, 12)))
+        
+        if rng.random() < MISSING_M3U8_RATE:
+            m3u8_url = 'Not found'
+        else:
+            stream_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+            resolution = rng.choices(['1280x720', '1920x1080', '842x480'], weights=[70, 25, 5])[0]
+            m3u8_url = f'https://surrit.com/{stream_id}/{resolution}/video.m3u8'
+        
+        release_date = FIRST_RELEASE + timedelta(days=rng.randrange(RELEASE_SPAN_DAYS))
+        
+        yield {
+            'video_url': f'https://missav.ai/dm{rng.randint(1, 230)}/en/{slug}',
+            'm3u8_url': m3u8_url,
+            'title': f'{code} {title_words.capitalize()}' + (f' - {cast[0]}' if cast else ''),
+            'code': code,
+            'release_date': release_date.isoformat(),
+            'actress': ', '.join(cast),
+            'genre': ', '.join(genres),
+            'maker': maker,
+            'director': rng.choice(directors) if rng.random() < 0.6 else '',
+            'label': prefix,
+            'description': title_words if rng.random() < 0.5 else '',
+            'thumbnail_url': f'https://fourhoi.com/{slug}/cover-n.jpg',
+        }
+
+
+def generate_catalog(output_path, rows, seed=0):
+    """Write a synthetic catalog CSV with `rows` videos. Returns the row count."""
+    with open(output_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(generate_rows(rows, seed))
+    return rows
+
+
+def parse_size(value):
+    """Accept a preset name (10k, 100k, 1m) or a plain row count."""
+    return CATALOG_SIZES.get(value.lower()) or int(value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic video catalog CSV")
+    parser.add_argument("size", type=parse_size,
+                        help="row count or preset: " + ", ".join(CATALOG_SIZES))
+    parser.add_argument("--output", default=None,
+                        help="CSV path (default: synthetic_<rows>.csv)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    output_path = args.output or f'synthetic_{args.size}.csv'
+    generate_catalog(output_path, args.size, args.seed)
+    print(f"Generated {args.size} videos in {output_path}")
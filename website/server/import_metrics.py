@@ -0,0 +1,119 @@
+import json
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is then left out of the report
+    resource = None
+
+
+def peak_memory_bytes():
+    """Peak resident memory of this process and its finished children."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * scale
+
+
+class ImportMetrics:
+    """Per-phase wall/CPU timers and SQL statement counts for an import.
+
+    Phases nest: while an inner phase runs the outer one is paused, so phase
+    times add up to the time spent inside phases rather than double counting.
+    """
+    
+    def __init__(self):
+        self.phases = {}
+        self.statements = 0
+        self._stack = []
+        self._started_at = datetime.now()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+    
+    def attach(self, conn):
+        """Count every SQL statement the connection executes."""
+        conn.set_trace_callback(self._count_statement)
+    
+    def _count_statement(self, statement):
+        self.statements += 1
+    
+    def _charge(self, name, wall, cpu):
+        phase = self.phases.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'calls': 0})
+        phase['wall_seconds'] += wall
+        phase['cpu_seconds'] += cpu
+    
+    @contextmanager
+    def phase(self, name):
+        """Time a block of work under the given phase name."""
+        now_wall, now_cpu = time.perf_counter(), time.process_time()
+        if self._stack:
+            # Pause the enclosing phase
+            outer, wall, cpu = self._stack[-1]
+            self._charge(outer, now_wall - wall, now_cpu - cpu)
+        self._stack.append((name, now_wall, now_cpu))
+        try:
+            yield
+        finally:
+            _, wall, cpu = self._stack.pop()
+            now_wall, now_cpu = time.perf_counter(), time.process_time()
+            self._charge(name, now_wall - wall, now_cpu - cpu)
+            self.phases[name]['calls'] += 1
+            if self._stack:
+                # Resume the enclosing phase
+                outer = self._stack[-1][0]
+                self._stack[-1] = (outer, now_wall, now_cpu)
+    
+    def report(self, rows, **extra):
+        """Build the JSON-serializable report for `rows` processed rows."""
+        wall = time.perf_counter() - self._wall_start
+        cpu = time.process_time() - self._cpu_start
+        return {
+            'started_at': self._started_at.isoformat(timespec='seconds'),
+            **extra,
+            'rows': rows,
+            'wall_seconds': round(wall, 4),
+            'cpu_seconds': round(cpu, 4),
+            'rows_per_second': round(rows / wall, 1) if wall else None,
+            'statements': self.statements,
+            'statements_per_second': round(self.statements / wall, 1) if wall else None,
+            'peak_memory_bytes': peak_memory_bytes(),
+            'phases': {
+                name: {
+                    'wall_seconds': round(phase['wall_seconds'], 4),
+                    'cpu_seconds': round(phase['cpu_seconds'], 4),
+                    'calls': phase['calls'],
+                }
+                for name, phase in self.phases.items()
+            },
+        }
+
+
+def report_path_for(db_path):
+    """Location of the import report for a database: videos.db -> videos.import.json."""
+    return Path(db_path).with_suffix('.import.json')
+
+
+def write_report(report, path):
+    """Write a report as indented JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def print_phases(report):
+    """Print the phase table of a report."""
+    print("Import Phases (wall / cpu seconds):")
+    for name, phase in report['phases'].items():
+        print(f"  {name:<12} {phase['wall_seconds']:>9.3f} / {phase['cpu_seconds']:>9.3f}")
+    print(f"  Rows/sec: {report['rows_per_second']}")
+    print(f"  SQL statements/sec: {report['statements_per_second']}")
+    if report['peak_memory_bytes'] is not None:
+        print(f"  Peak memory: {report['peak_memory_bytes'] / (1024 * 1024):.1f} MiB")
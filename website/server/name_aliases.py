@@ -0,0 +1,208 @@
+import argparse
+import re
+import unicodedata
+from functools import lru_cache
+
+# Alias keys shorter than this are not matched on typos ('sod' and 'sos'
+# are different makers)
+MIN_FUZZY_LENGTH = 8
+
+# Latin diacritics such as the macron in 'Satō'; kana voicing marks are
+# outside this block and are kept
+LATIN_DIACRITICS = re.compile('[\u0300-\u036f]')
+
+# Apostrophes, hyphens and dots inside a name part ("Shin'ya", "Ai-chan")
+JOINERS = re.compile(r"[-'’.·]")
+
+# Name parts, with the joiners inside them kept
+NAME_PARTS = re.compile(r"\w+(?:[-'’.·]\w+)*")
+
+# Romanization variants folded to one spelling, in order: Nihon-shiki to
+# Hepburn, long vowels to short ones, and 'm' before labials to 'n'. Many
+# different names fold together, so these only find merge candidates.
+ROMANIZATION_FOLDS = [
+    (re.compile(r'sy([auo])'), r'sh\1'),
+    (re.compile(r'(?:ty|cy)([auo])'), r'ch\1'),
+    (re.compile(r'(?:zy|jy|dy)([auo])'), r'j\1'),
+    (re.compile(r'si'), 'shi'),
+    (re.compile(r'ti'), 'chi'),
+    (re.compile(r'tu'), 'tsu'),
+    (re.compile(r'(?:zi|di)'), 'ji'),
+    (re.compile(r'(?<![sc])hu'), 'fu'),
+    (re.compile(r'oh(?![aeiouy])'), 'o'),
+    (re.compile(r'ou'), 'o'),
+    (re.compile(r'([aeiou])\1+'), r'\1'),
+    (re.compile(r'm(?=[bpm])'), 'n'),
+]
+
+
+@lru_cache(maxsize=65536)
+def fold_part(part):
+    """Fold one lowercase name part to its plain Hepburn spelling."""
+    if not part.isascii():
+        return part
+    for pattern, replacement in ROMANIZATION_FOLDS:
+        part = pattern.sub(replacement, part)
+    return part
+
+
+def name_parts(name):
+    """Lowercase parts of a name, without width or Latin diacritics."""
+    text = unicodedata.normalize('NFKD', name)
+    text = unicodedata.normalize('NFKC', LATIN_DIACRITICS.sub('', text)).casefold()
+    return NAME_PARTS.findall(text)
+
+
+def alias_key(name):
+    """Spelling-insensitive key of a name; names with the same key are aliases.
+
+    Only case, width, Latin diacritics and the order of the name parts are
+    ignored, so 'Sayama Love', 'Love Sayama' and 'SAYAMA love' share a key,
+    as do 'Satō Yūki' and 'Yuki Sato'. Names sharing a key are merged
+    without review.
+    """
+    return ' '.join(sorted(name_parts(name)))
+
+
+def romanized_key(name):
+    """alias_key that also ignores joiners and romanization variants.
+
+    'Yuuki Satou' and 'Satō Yūki' share this key, but so do names of
+    different people, so it only proposes merges for review.
+    """
+    return ' '.join(sorted(fold_part(JOINERS.sub('', part)) for part in name_parts(name)))
+
+
+def deletions(key):
+    """The key with each one of its characters left out."""
+    return {key[:i] + key[i + 1:] for i in range(len(key))}
+
+
+def one_edit_apart(key, other):
+    """Whether two different keys differ by one added, dropped or replaced character."""
+    if len(key) == len(other):
+        return sum(a != b for a, b in zip(key, other)) == 1
+    if len(key) > len(other):
+        key, other = other, key
+    return len(other) == len(key) + 1 and key in deletions(other)
+
+
+def near_pairs(keys, min_length=MIN_FUZZY_LENGTH):
+    """Pairs of keys one typo apart: a character added, dropped or replaced.
+
+    Instead of comparing every pair, each key is filed under itself and its
+    single-character deletions. Two keys one edit apart always meet under
+    one of those entries, so only keys sharing an entry are compared, in
+    about O(n * key length) overall. Keys shorter than min_length are left out,
+    as one letter is too large a share of them.
+    """
+    blocks = {}
+    for key in keys:
+        if len(key) < min_length:
+            continue
+        for variant in deletions(key) | {key}:
+            blocks.setdefault(variant, []).append(key)
+    
+    pairs = set()
+    for block in blocks.values():
+        for i, key in enumerate(block):
+            for other in block[i + 1:]:
+                if key != other and one_edit_apart(key, other):
+                    pairs.add((min(key, other), max(key, other)))
+    return sorted(pairs)
+
+
+if __name__ == "__main__":
+    # csv_to_sqlite imports this module, so it is only imported when run
+    from csv_to_sqlite import (
+        CATEGORY_ALIASES, CATEGORY_LINKS, CATEGORY_STATS, create_database, excluded_pairs,
+        keep_apart, merge_categories, resolve_aliases, unmerge_alias,
+    )
+    
+    parser = argparse.ArgumentParser(
+        description="Merge actress and maker names that are spellings of the same name"
+    )
+    parser.add_argument("--db", dest="db_file", default="videos.db")
+    parser.add_argument("--kind", choices=list(CATEGORY_ALIASES), default="actresses",
+                        help="category table of the names listed or merged")
+    parser.add_argument("--limit", type=int, default=50, help="candidates listed")
+    parser.add_argument("--merge", action="append", default=[], metavar="ALIAS=CANONICAL",
+                        help="merge a name into another one, e.g. from the candidates")
+    parser.add_argument("--unmerge", action="append", default=[], metavar="ALIAS",
+                        help="split a merged spelling off into a name of its own")
+    parser.add_argument("--keep-apart", action="append", default=[], metavar="NAME=OTHER",
+                        help="never merge two names automatically, splitting them if merged")
+    args = parser.parse_args()
+    
+    conn = create_database(args.db_file, rebuild=False)
+    cursor = conn.cursor()
+    aliases, names_view = CATEGORY_ALIASES[args.kind]
+    
+    # Either side may be given by one of its aliases
+    ids = dict(cursor.execute(f'SELECT name, id FROM {names_view}'))
+    alias_names = {alias for (alias,) in cursor.execute(f'SELECT alias FROM {aliases}')}
+    
+    def known_pair(pair):
+        name, _, other = (part.strip() for part in pair.partition('='))
+        if name not in ids or other not in ids:
+            parser.error(f"unknown {args.kind} name in {pair!r}")
+        return name, other
+    
+    pairs_apart = [known_pair(pair) for pair in args.keep_apart]
+    pairs_merged = [known_pair(pair) for pair in args.merge]
+    for alias in args.unmerge:
+        moved = unmerge_alias(cursor, args.kind, alias)
+        if moved is None:
+            parser.error(f"{alias!r} is not a merged spelling among {args.kind}")
+        print(f"Split {alias!r} off with {moved} videos")
+    for name, other in pairs_apart:
+        # Merged names are split first; the alias side is split off
+        if ids[name] == ids[other]:
+            alias = name if name in alias_names else other
+            print(f"Split {alias!r} off with {unmerge_alias(cursor, args.kind, alias)} videos")
+        keep_apart(cursor, args.kind, name, other)
+    
+    merges = {}
+    for alias, canonical in pairs_merged:
+        merges[ids[alias]] = ids[canonical]
+        # An explicit merge overrides an earlier exclusion
+        cursor.execute(
+            'DELETE FROM alias_exclusions WHERE kind = ? AND name = ? AND other = ?',
+            (args.kind,) + tuple(sorted((alias, canonical)))
+        )
+    if merges:
+        print(f"Merged {merge_categories(cursor, args.kind, merges)} {args.kind} as requested")
+    for table, count in resolve_aliases(cursor, full=True).items():
+        print(f"Merged {count} {table} spelled differently from another name")
+    conn.commit()
+    
+    # Romanization variants and typos are only listed: such names are often
+    # different people
+    stats = CATEGORY_STATS[args.kind]
+    column = CATEGORY_LINKS[args.kind][1]
+    counts = dict(cursor.execute(f'SELECT {column}, video_count FROM {stats}'))
+    excluded = excluded_pairs(cursor, args.kind)
+    names_by_key = {}
+    for name, category_id in cursor.execute(f'SELECT name, id FROM {args.kind}'):
+        names_by_key.setdefault(romanized_key(name), []).append((name, counts.get(category_id, 0)))
+    candidates = {
+        'romanization variants': [
+            (first, second)
+            for names in names_by_key.values()
+            for i, first in enumerate(names)
+            for second in names[i + 1:]
+        ],
+        'near matches': [
+            (first, second)
+            for key, other in near_pairs(names_by_key)
+            for first in names_by_key[key]
+            for second in names_by_key[other]
+        ],
+    }
+    for label, pairs in candidates.items():
+        pairs = [pair for pair in pairs if frozenset((pair[0][0], pair[1][0])) not in excluded]
+        pairs.sort(key=lambda pair: -(pair[0][1] + pair[1][1]))
+        print(f"\n{len(pairs)} {label} among {args.kind}, most videos first:")
+        for (name, count), (other, other_count) in pairs[:args.limit]:
+            print(f"  {name} ({count}) ~ {other} ({other_count})")
+    conn.close()
@@ -0,0 +1,224 @@
+import argparse
+import json
+import re
+import time
+from array import array
+
+from columnar_file import SectionFile, StringDictionary, write_sections
+from export_to_json import EXPORT_FIELDS, LIST_FIELDS
+
+PACK_MAGIC = b'VLPACK\x00\x01'
+# 2: the container and string dictionary of catalog snapshots (columnar_file)
+PACK_VERSION = 2
+
+# URL shapes stored as a template number and parameters instead of text.
+# {code} is the lowercase video code, {uuid} a lowercase UUID stored as 16
+# bytes and {0} one string from the dictionary. URLs matching no template
+# are stored whole as template 0.
+URL_TEMPLATES = {
+    'videoUrl': ['https://missav.ai/{0}/en/{code}', 'https://missav.ai/en/{code}'],
+    'm3u8Url': ['https://surrit.com/{uuid}/{0}/video.m3u8'],
+    'thumbnailUrl': ['https://fourhoi.com/{code}/cover-n.jpg'],
+}
+
+TEMPLATE_PLACEHOLDERS = {
+    'code': '[^/]+',
+    'uuid': '[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}',
+    '0': '[^/]*',
+}
+
+UUID_SIZE = 16
+
+# Unsigned array types tried in order; each integer column uses the first
+# one its largest value fits
+PACK_TYPECODES = ('B', 'H', 'I', 'Q')
+
+
+def compile_template(template):
+    """Regex matching the URLs a template produces, placeholders as groups p<name>."""
+    pattern = ''
+    for index, part in enumerate(re.split(r'\{(\w+)\}', template)):
+        pattern += re.escape(part) if index % 2 == 0 else f'(?P<p{part}>{TEMPLATE_PLACEHOLDERS[part]})'
+    return re.compile(pattern)
+
+
+def format_uuid(data):
+    text = bytes(data).hex()
+    return f'{text[:8]}-{text[8:12]}-{text[12:16]}-{text[16:20]}-{text[20:]}'
+
+
+def smallest_array(values):
+    """values as an array of the smallest unsigned type that holds them."""
+    largest = max(values, default=0)
+    for typecode in PACK_TYPECODES:
+        if largest < 1 << (8 * array(typecode).itemsize):
+            return array(typecode, values)
+    raise OverflowError(largest)
+
+
+def write_packed(videos, output_path):
+    """Write export objects as packed columns. Returns the number of videos.
+
+    Takes (video id, export object) pairs as yielded by export_rows(). Every
+    distinct string is stored once in a dictionary and columns hold string
+    ids (0 = null). Actresses, genres and makers are numbered per kind and
+    linked through per-video offset arrays. URLs are stored as a template
+    number, one string parameter and a UUID (see URL_TEMPLATES). Every
+    column has one fixed-size entry per video, or an offset array, so any
+    video can be decoded without reading the others.
+    """
+    strings = StringDictionary()
+    templates = {
+        key: [(template, compile_template(template)) for template in URL_TEMPLATES[key]]
+        for key in URL_TEMPLATES
+    }
+    categories = {key: {} for key in LIST_FIELDS}
+    columns = {}
+    for key in EXPORT_FIELDS:
+        if key in LIST_FIELDS:
+            columns[f'{key}.offsets'] = [0]
+            columns[f'{key}.values'] = []
+        elif key in URL_TEMPLATES:
+            columns[f'{key}.template'] = []
+            columns[f'{key}.param'] = []
+            columns[f'{key}.uuid'] = bytearray()
+        else:
+            columns[key] = []
+    
+    count = 0
+    for _, video in videos:
+        count += 1
+        code = (video['code'] or '').lower()
+        for key, value in video.items():
+            if key in LIST_FIELDS:
+                ids = categories[key]
+                values = columns[f'{key}.values']
+                values.extend(ids.setdefault(name, len(ids)) for name in value.split(', ') if value)
+                columns[f'{key}.offsets'].append(len(values))
+                continue
+            if key not in URL_TEMPLATES:
+                columns[key].append(strings.intern(value))
+                continue
+            
+            number, param, uuid = 0, value, ''
+            for candidate, (template, pattern) in enumerate(templates[key], 1):
+                match = pattern.fullmatch(value or '')
+                if match is None:
+                    continue
+                groups = match.groupdict()
+                # Only used when formatting gives back exactly this URL
+                if template.format(groups.get('p0'), code=code, uuid=groups.get('puuid')) == value:
+                    number, param, uuid = candidate, groups.get('p0'), groups.get('puuid') or ''
+                    break
+            columns[f'{key}.template'].append(number)
+            columns[f'{key}.param'].append(strings.intern(param))
+            columns[f'{key}.uuid'] += bytes.fromhex(uuid.replace('-', '')) or bytes(UUID_SIZE)
+    
+    for key, ids in categories.items():
+        columns[f'{key}.names'] = [strings.intern(name) for name in ids]
+    
+    columns.update(strings.sections())
+    for name, values in columns.items():
+        if not isinstance(values, bytearray):
+            columns[name] = smallest_array(values)
+    write_sections(output_path, PACK_MAGIC, {
+        'version': PACK_VERSION,
+        'rows': count,
+        'fields': list(EXPORT_FIELDS),
+        'lists': sorted(LIST_FIELDS),
+        'templates': URL_TEMPLATES,
+    }, columns)
+    return count
+
+
+class PackedCatalog(SectionFile):
+    """Read-only view of a file written by write_packed().
+
+    A SectionFile: opening costs the same for any catalog size, a video is
+    only decoded when it is asked for, and a single field can be read
+    without the others. Videos are returned as the same objects as in the
+    JSON export.
+    """
+    
+    MAGIC = PACK_MAGIC
+    VERSION = PACK_VERSION
+    DESCRIPTION = 'packed export'
+    
+    def __init__(self, path):
+        super().__init__(path)
+        self.fields = self.header['fields']
+        self.lists = set(self.header['lists'])
+        self.templates = self.header['templates']
+        self._names = {}
+    
+    def __iter__(self):
+        return map(self.video, range(self.rows))
+    
+    def names(self, key):
+        """Category names of one list field, by their number."""
+        if key not in self._names:
+            self._names[key] = [self.string(string_id) for string_id in self._sections[f'{key}.names']]
+        return self._names[key]
+    
+    def value(self, key, row):
+        """One field of the video at a row, as in the JSON export."""
+        if key in self.lists:
+            offsets = self._sections[f'{key}.offsets']
+            values = self._sections[f'{key}.values'][offsets[row]:offsets[row + 1]]
+            names = self.names(key)
+            return ', '.join([names[value] for value in values])
+        if key not in self.templates:
+            return self.string(self._sections[key][row])
+        
+        number = self._sections[f'{key}.template'][row]
+        param = self.string(self._sections[f'{key}.param'][row])
+        if not number:
+            return param
+        uuid = self._sections[f'{key}.uuid'][row * UUID_SIZE:(row + 1) * UUID_SIZE]
+        return self.templates[key][number - 1].format(
+            param, code=(self.value('code', row) or '').lower(), uuid=format_uuid(uuid)
+        )
+    
+    def video(self, row):
+        """Decode the video at a row; rows are in code order, as in the JSON export."""
+        if not 0 <= row < self.rows:
+            raise IndexError(row)
+        return {key: self.value(key, row) for key in self.fields}
+    
+    def page(self, limit=50, offset=0):
+        return [self.video(row) for row in range(offset, min(offset + limit, self.rows))]
+    
+    def column(self, key):
+        """One field of every video, without decoding the others."""
+        return [self.value(key, row) for row in range(self.rows)]
+
+
+def read_packed(path):
+    """Every video of a packed file; equals json.load() of the JSON export."""
+    with PackedCatalog(path) as catalog:
+        return list(catalog)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare a packed export with its JSON export")
+    parser.add_argument("packed")
+    parser.add_argument("json_file", nargs="?", help="JSON export of the same database")
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    with PackedCatalog(args.packed) as catalog:
+        opened = time.perf_counter() - start
+        first_page = catalog.page()
+        paged = time.perf_counter() - start
+    print(f"{len(catalog)} videos: opened in {opened * 1000:.2f}ms, "
+          f"first {len(first_page)} decoded in {paged * 1000:.2f}ms")
+    
+    if args.json_file:
+        start = time.perf_counter()
+        with open(args.json_file, encoding='utf-8') as f:
+            videos = json.load(f)
+        print(f"JSON export parsed in {(time.perf_counter() - start) * 1000:.0f}ms")
+        start = time.perf_counter()
+        same = read_packed(args.packed) == videos
+        print(f"Packed export decoded in {(time.perf_counter() - start) * 1000:.0f}ms, "
+              f"{'identical' if same else 'DIFFERENT'}")
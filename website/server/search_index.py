@@ -0,0 +1,251 @@
+import argparse
+import heapq
+import json
+import re
+import sqlite3
+import unicodedata
+from array import array
+from pathlib import Path
+
+from export_to_json import export_rows, write_json_atomically
+from name_aliases import LATIN_DIACRITICS
+from video_repository import SEARCH_WEIGHTS
+
+# Export key -> weight of a match in it, from the bm25 weights of the
+# server's search (video_code, title, actresses)
+SEARCH_FIELDS = {
+    'code': SEARCH_WEIGHTS[0],
+    'title': SEARCH_WEIGHTS[1],
+    'actress': SEARCH_WEIGHTS[3],
+}
+
+# Postings store (position << FIELD_BITS) | mask of the fields containing
+# the term, gap-encoded
+FIELD_BITS = len(SEARCH_FIELDS)
+
+# Terms are sharded by their first characters; a query word this long or
+# longer needs only the one shard, shorter ones every shard starting with it
+SHARD_PREFIX_LENGTH = 2
+
+# The prefix table covers prefixes up to this length with the most used
+# terms starting with them
+AUTOCOMPLETE_PREFIX_LENGTH = 3
+AUTOCOMPLETE_SIZE = 10
+
+INDEX_NAME = 'index.json'
+DOCUMENTS_NAME = 'documents.json'
+AUTOCOMPLETE_NAME = 'autocomplete.json'
+SHARD_DIRECTORY = 'shards'
+
+SAFE_PREFIX = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Search terms of a text: lowercase words without Latin diacritics.
+
+    Kana voicing marks are kept, as in name_aliases.alias_key. A client
+    searching the index has to tokenize queries the same way.
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text)
+    text = unicodedata.normalize('NFKC', LATIN_DIACRITICS.sub('', text)).casefold()
+    return re.findall(r'\w+', text)
+
+
+def code_terms(code):
+    """Terms of a video code, plus the code without separators ('abp984')."""
+    terms = tokenize(code)
+    if len(terms) > 1:
+        terms.append(''.join(terms))
+    return terms
+
+
+def shard_name(prefix):
+    """File name of the shard of a prefix; non-ASCII prefixes are hex-encoded."""
+    if SAFE_PREFIX.fullmatch(prefix):
+        return f'{prefix}.json'
+    return f'x{prefix.encode("utf-8").hex()}.json'
+
+
+def gaps(postings):
+    """Differences between consecutive postings, the first one as is."""
+    return [value - previous for previous, value in zip([0] + postings[:-1], postings)]
+
+
+def export_search_index(db_path='videos.db', output_dir='search'):
+    """Write an inverted index over codes, titles and actresses for static search.
+
+    Documents are numbered in JSON export order and documents.json lists
+    their codes. Terms are sharded by their first SHARD_PREFIX_LENGTH
+    characters into shards/*.json, each mapping its terms to gap-encoded
+    postings, and autocomplete.json maps short prefixes to the terms used
+    by most videos. index.json, written last, describes the layout and
+    lists the shards. A query word is matched as a prefix of terms, as by
+    the server's full-text search. Returns the number of distinct terms.
+    """
+    output_dir = Path(output_dir)
+    shard_dir = output_dir / SHARD_DIRECTORY
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    
+    conn = sqlite3.connect(db_path)
+    codes = []
+    postings = {}
+    for position, (_, video) in enumerate(export_rows(conn)):
+        codes.append(video['code'])
+        masks = {}
+        for bit, key in enumerate(SEARCH_FIELDS):
+            for term in code_terms(video[key]) if key == 'code' else tokenize(video[key]):
+                masks[term] = masks.get(term, 0) | 1 << bit
+        for term, mask in masks.items():
+            term_postings = postings.get(term)
+            if term_postings is None:
+                term_postings = postings[term] = array('Q')
+            term_postings.append(position << FIELD_BITS | mask)
+    conn.close()
+    
+    shards = {}
+    for term in postings:
+        shards.setdefault(term[:SHARD_PREFIX_LENGTH], []).append(term)
+    shard_entries = {}
+    for prefix, terms in sorted(shards.items()):
+        name = shard_name(prefix)
+        terms.sort()
+        write_json_atomically(shard_dir / name, {term: gaps(postings[term].tolist()) for term in terms})
+        shard_entries[prefix] = {
+            'file': f'{SHARD_DIRECTORY}/{name}',
+            'terms': len(terms),
+            'bytes': (shard_dir / name).stat().st_size,
+        }
+    
+    written = {Path(entry['file']).name for entry in shard_entries.values()}
+    for path in shard_dir.glob('*.json'):
+        if path.name not in written:
+            path.unlink()
+    
+    completions = {}
+    for term, term_postings in postings.items():
+        for length in range(1, min(len(term), AUTOCOMPLETE_PREFIX_LENGTH) + 1):
+            completions.setdefault(term[:length], []).append((len(term_postings), term))
+    autocomplete = {
+        prefix: [[term, count] for count, term in heapq.nsmallest(
+            AUTOCOMPLETE_SIZE, candidates, key=lambda candidate: (-candidate[0], candidate[1])
+        )]
+        for prefix, candidates in sorted(completions.items())
+    }
+    
+    write_json_atomically(output_dir / DOCUMENTS_NAME, codes)
+    write_json_atomically(output_dir / AUTOCOMPLETE_NAME, autocomplete)
+    # Replace the index last, so it never lists shards not yet written
+    write_json_atomically(output_dir / INDEX_NAME, {
+        'documents': len(codes),
+        'terms': len(postings),
+        'fields': list(SEARCH_FIELDS),
+        'weights': list(SEARCH_FIELDS.values()),
+        'fieldBits': FIELD_BITS,
+        'prefixLength': SHARD_PREFIX_LENGTH,
+        'autocompleteLength': AUTOCOMPLETE_PREFIX_LENGTH,
+        'documentsFile': DOCUMENTS_NAME,
+        'autocompleteFile': AUTOCOMPLETE_NAME,
+        'shards': shard_entries,
+    })
+    
+    print(f"Indexed {len(postings)} terms of {len(codes)} videos in {len(shard_entries)} shards "
+          f"to {output_dir}")
+    return len(postings)
+
+
+class StaticSearch:
+    """Searches an exported index the way a static client would.
+
+    Shards are read only when a query needs them; a one-letter word needs
+    all shards starting with it. Every query word must prefix-match a term
+    of the video; results are ranked by the weights of the fields matched,
+    then by export order.
+    """
+    
+    def __init__(self, index_dir):
+        self.index_dir = Path(index_dir)
+        with open(self.index_dir / INDEX_NAME, encoding='utf-8') as f:
+            self.index = json.load(f)
+        self._shards = {}
+        self._documents = None
+        self._autocomplete = None
+    
+    def _load(self, name):
+        with open(self.index_dir / name, encoding='utf-8') as f:
+            return json.load(f)
+    
+    def shard(self, prefix):
+        entry = self.index['shards'].get(prefix)
+        if entry is None:
+            return {}
+        if prefix not in self._shards:
+            self._shards[prefix] = self._load(entry['file'])
+        return self._shards[prefix]
+    
+    def completions(self, prefix):
+        """Most used terms starting with a prefix."""
+        prefix = ''.join(tokenize(prefix))
+        if len(prefix) <= self.index['autocompleteLength']:
+            if self._autocomplete is None:
+                self._autocomplete = self._load(self.index['autocompleteFile'])
+            return [term for term, _ in self._autocomplete.get(prefix, [])]
+        shard = self.shard(prefix[:self.index['prefixLength']])
+        matches = [(len(postings), term) for term, postings in shard.items() if term.startswith(prefix)]
+        return [term for _, term in heapq.nsmallest(
+            AUTOCOMPLETE_SIZE, matches, key=lambda match: (-match[0], match[1])
+        )]
+    
+    def _scores(self, word):
+        """Document position -> score of the terms a query word prefix-matches."""
+        # Shorter words than the shard prefix need every shard under them
+        prefixes = [word[:self.index['prefixLength']]]
+        if len(word) < self.index['prefixLength']:
+            prefixes = [prefix for prefix in self.index['shards'] if prefix.startswith(word)]
+        
+        weights = self.index['weights']
+        bits = self.index['fieldBits']
+        scores = {}
+        for values in (values for prefix in prefixes
+                       for term, values in self.shard(prefix).items() if term.startswith(word)):
+            value = 0
+            for gap in values:
+                value += gap
+                position, mask = value >> bits, value & ((1 << bits) - 1)
+                score = sum(weight for bit, weight in enumerate(weights) if mask & 1 << bit)
+                scores[position] = max(scores.get(position, 0), score)
+        return scores
+    
+    def search(self, query, limit=20):
+        """Codes of the videos matching every word of a query, best first."""
+        words = tokenize(query)
+        if not words:
+            return []
+        scores = None
+        for word in words:
+            word_scores = self._scores(word)
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {position: score + word_scores[position]
+                          for position, score in scores.items() if position in word_scores}
+        if self._documents is None:
+            self._documents = self._load(self.index['documentsFile'])
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self._documents[position] for position, _ in best]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a sharded search index for static search")
+    parser.add_argument("--db", dest="db_file", default="videos.db")
+    parser.add_argument("--output", default="search")
+    parser.add_argument("--query", default=None, help="search the written index, as a client would")
+    args = parser.parse_args()
+    
+    export_search_index(args.db_file, args.output)
+    if args.query:
+        search = StaticSearch(args.output)
+        print(f"Completions: {', '.join(search.completions(args.query.split()[-1]))}")
+        for code in search.search(args.query):
+            print(f"  {code}")
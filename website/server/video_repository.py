@@ -0,0 +1,453 @@
+import json
+import queue
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from categories import ALIASED_KINDS, CATEGORY_KINDS, EPOCH
+from facet_index import FacetIndex
+
+
+# Prepared statements kept per pooled connection. sqlite3 caches compiled
+# statements by SQL text, so every query below is planned once per connection.
+STATEMENT_CACHE_SIZE = 256
+
+# bm25 column weights, in videos_fts column order:
+# video_code, title, description, actresses, genres, makers
+SEARCH_WEIGHTS = (10.0, 5.0, 1.0, 3.0, 2.0, 2.0)
+
+# Views resolving both the names and the merged spellings (aliases) of a
+# category, for the kinds whose aliases are merged by the importer
+CATEGORY_NAME_VIEWS = {kind: names for kind, (_, names) in ALIASED_KINDS.items()}
+
+# Listing order; matches idx_video_summary_listing so pages are index seeks
+SUMMARY_ORDER = 'ORDER BY s.release_date DESC, s.video_id DESC'
+
+BY_CODE_SQL = 'SELECT s.* FROM video_summary s WHERE s.video_code = ?'
+
+RECENT_SQL = f'SELECT s.* FROM video_summary s {SUMMARY_ORDER} LIMIT ? OFFSET ?'
+
+SIMILAR_SQL = '''
+    SELECT s.*, vs.score AS similarity FROM video_similar vs
+    JOIN video_summary s ON s.video_id = vs.similar_id
+    WHERE vs.video_id = ?
+    ORDER BY vs.rank
+    LIMIT ?
+'''
+
+# Facet results up to this size are paged by id; larger ones by walking the
+# listing index and keeping the videos in the result
+BROWSE_ID_LIMIT = 5000
+
+# Rows after a keyset cursor; left out on first pages. video_summary dates
+# are never NULL, so no row falls outside the comparison.
+AFTER_CURSOR = '(s.release_date, s.video_id) < (?, ?)'
+
+LISTING_SQL = f'SELECT s.video_id FROM video_summary s {{where}} {SUMMARY_ORDER}'
+
+IDS_SQL = f'''
+    SELECT s.* FROM video_summary s
+    WHERE s.video_id IN (SELECT value FROM json_each(?)) {{after}}
+    {SUMMARY_ORDER}
+    LIMIT ?
+'''
+
+SEARCH_SQL = f'''
+    SELECT s.*, bm25(videos_fts, {', '.join(str(weight) for weight in SEARCH_WEIGHTS)}) AS rank
+    FROM videos_fts
+    JOIN video_summary s ON s.video_id = videos_fts.rowid
+    WHERE videos_fts MATCH ?
+    ORDER BY rank
+    LIMIT ? OFFSET ?
+'''
+
+
+def category_ids_sql(kind):
+    """Subquery selecting the ids of videos linked to one category name or alias."""
+    table, junction, column, _ = CATEGORY_KINDS[kind]
+    return f'''
+        SELECT j.video_id FROM {junction} j
+        JOIN {CATEGORY_NAME_VIEWS.get(kind, table)} c ON c.id = j.{column}
+        WHERE c.name = ?
+    '''
+
+
+def by_category_sql(kind):
+    return f'''
+        SELECT s.* FROM video_summary s
+        WHERE s.video_id IN ({category_ids_sql(kind)})
+        {SUMMARY_ORDER}
+        LIMIT ? OFFSET ?
+    '''
+
+
+def top_categories_sql(kind):
+    table, _, column, stats = CATEGORY_KINDS[kind]
+    return f'''
+        SELECT c.name, st.video_count, st.latest_release_date
+        FROM {stats} st
+        JOIN {table} c ON c.id = st.{column}
+        ORDER BY st.video_count DESC, c.name
+        LIMIT ?
+    '''
+
+
+RELEASE_COUNT_SQL = 'SELECT COUNT(*) FROM videos WHERE release_day BETWEEN ? AND ?'
+
+RELEASE_SPAN_SQL = 'SELECT MIN(release_day), MAX(release_day) FROM videos'
+
+
+def day_number(value):
+    """Day number of a date or ISO date string, as stored in videos.release_day."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return (value - EPOCH).days
+
+
+def day_to_date(day):
+    return EPOCH + timedelta(days=day)
+
+
+def period_bounds(year, month=None):
+    """First and last day of a year, or of a month within it."""
+    if month is None:
+        return date(year, 1, 1), date(year, 12, 31)
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return date(year, month, 1), next_month - timedelta(days=1)
+
+
+def release_periods(first_day, last_day, granularity='year'):
+    """Yield (label, (first, last)) for every year or month between two dates."""
+    year, month = first_day.year, first_day.month
+    while date(year, month if granularity == 'month' else 1, 1) <= last_day:
+        if granularity == 'month':
+            yield f'{year}-{month:02d}', period_bounds(year, month)
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        else:
+            yield str(year), period_bounds(year)
+            year += 1
+
+
+def facet_names(actresses=(), genres=(), makers=()):
+    """Flatten facet filters into (kind, name) pairs."""
+    names = [('actress', name) for name in actresses]
+    names += [('genre', name) for name in genres]
+    names += [('maker', name) for name in makers]
+    return names
+
+
+def facet_filter_sql(names):
+    """WHERE condition restricting s.video_id to videos matching every name."""
+    intersection = ' INTERSECT '.join(category_ids_sql(kind) for kind, _ in names)
+    return f's.video_id IN ({intersection})'
+
+
+def page_cursor(video):
+    """Keyset cursor pointing just past a video in listing order."""
+    return (video['release_date'], video['video_id'])
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query where every word must prefix-match."""
+    terms = re.findall(r'\w+', text)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def summary_to_dict(row):
+    """Convert a video_summary row into a dict with decoded category lists."""
+    video = dict(row)
+    for key in ('actresses', 'genres', 'makers'):
+        video[key] = json.loads(video[key]) if video.get(key) else []
+    return video
+
+
+class VideoRepository:
+    """Read-only query layer over the database built by csv_to_sqlite.py.
+
+    Queries run on a pool of read-only connections, each with its own
+    prepared-statement cache. Results are kept in an LRU cache that is
+    cleared whenever PRAGMA data_version shows another connection committed,
+    so a re-import is picked up without restarting. Returned rows are shared
+    with the cache and should be treated as read-only.
+    """
+    
+    def __init__(self, db_path='videos.db', pool_size=4, cache_size=512):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        # Dedicated connection for data_version checks, which are only
+        # meaningful when always asked of the same connection
+        self._monitor = self._connect()
+        self._data_version = self._read_data_version()
+        self._facets = None
+        self._facets_version = None
+        self._facets_lock = threading.Lock()
+    
+    def _connect(self):
+        conn = sqlite3.connect(
+            f'file:{self.db_path}?mode=ro',
+            uri=True,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def _read_data_version(self):
+        return self._monitor.execute('PRAGMA data_version').fetchone()[0]
+    
+    def close(self):
+        """Close every pooled connection."""
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+        self._monitor.close()
+        if self._facets is not None:
+            self._facets.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled read-only connection."""
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+    
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+    
+    def _cached(self, key, compute):
+        with self._lock:
+            version = self._read_data_version()
+            if version != self._data_version:
+                self._data_version = version
+                self._cache.clear()
+            elif key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        
+        result = compute()
+        
+        with self._lock:
+            # Don't cache a result that may predate a change seen meanwhile
+            if self._data_version == version:
+                self._cache[key] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+    
+    def _fetch(self, key, sql, params, one=False):
+        def compute():
+            with self.connection() as conn:
+                if one:
+                    row = conn.execute(sql, params).fetchone()
+                    return summary_to_dict(row) if row else None
+                return [summary_to_dict(row) for row in conn.execute(sql, params)]
+        return self._cached(key, compute)
+    
+    def by_code(self, code):
+        """Return one video by its code (e.g. 'ABP-984'), or None."""
+        return self._fetch(('code', code), BY_CODE_SQL, (code,), one=True)
+    
+    def by_actress(self, name, limit=50, offset=0):
+        """Videos featuring an actress, newest first."""
+        return self._fetch(('actress', name, limit, offset),
+                           by_category_sql('actress'), (name, limit, offset))
+    
+    def by_genre(self, name, limit=50, offset=0):
+        """Videos in a genre, newest first."""
+        return self._fetch(('genre', name, limit, offset),
+                           by_category_sql('genre'), (name, limit, offset))
+    
+    def by_maker(self, name, limit=50, offset=0):
+        """Videos from a maker, newest first."""
+        return self._fetch(('maker', name, limit, offset),
+                           by_category_sql('maker'), (name, limit, offset))
+    
+    def recent(self, limit=20, offset=0):
+        """Latest releases."""
+        return self._fetch(('recent', limit, offset), RECENT_SQL, (limit, offset))
+    
+    def filter(self, actresses=(), genres=(), makers=(), limit=50, offset=0):
+        """Videos matching every given actress, genre and maker name, newest first.
+
+        The video id sets of the names are intersected, so adding facets adds
+        one indexed lookup each instead of another five-table join.
+        """
+        names = facet_names(actresses, genres, makers)
+        if not names:
+            return self.recent(limit, offset)
+        
+        # SQL text only depends on the facet kinds, so each shape is prepared once
+        sql = f'''
+            SELECT s.* FROM video_summary s
+            WHERE {facet_filter_sql(names)}
+            {SUMMARY_ORDER}
+            LIMIT ? OFFSET ?
+        '''
+        params = tuple(name for _, name in names) + (limit, offset)
+        # The SQL names the facet kinds, so names under different kinds never share an entry
+        return self._fetch(('filter', sql) + params, sql, params)
+    
+    def page(self, limit=20, after=None, actresses=(), genres=(), makers=(),
+             released_from=None, released_to=None):
+        """One page of a release-ordered listing, optionally filtered by facets.
+
+        Uses keyset (seek) pagination over (release_date, video_id): `after`
+        is the cursor returned with the previous page, so any page costs the
+        same as the first one instead of skipping OFFSET rows. released_from
+        and released_to are inclusive ISO dates. Returns (videos, next_cursor);
+        next_cursor is None on the last page.
+        """
+        names = facet_names(actresses, genres, makers)
+        conditions = [facet_filter_sql(names)] if names else []
+        params = tuple(name for _, name in names)
+        # The importer stores ISO dates, so text ranges are date ranges
+        if released_from is not None:
+            conditions.append('s.release_date >= ?')
+            params += (released_from,)
+        if released_to is not None:
+            # Undated videos are stored as '' and match no date range
+            conditions.append("s.release_date <= ? AND s.release_date <> ''")
+            params += (released_to,)
+        if after is not None:
+            conditions.append(AFTER_CURSOR)
+            params += tuple(after)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        sql = f'SELECT s.* FROM video_summary s {where} {SUMMARY_ORDER} LIMIT ?'
+        params += (limit,)
+        
+        videos = self._fetch(('page', sql) + params, sql, params)
+        next_cursor = page_cursor(videos[-1]) if len(videos) == limit else None
+        return videos, next_cursor
+    
+    def released_in(self, year, month=None, limit=20, after=None):
+        """Keyset page of the videos released in a year or month."""
+        first_day, last_day = period_bounds(year, month)
+        return self.page(limit, after, released_from=first_day.isoformat(),
+                         released_to=last_day.isoformat())
+    
+    def count_released(self, first_day, last_day):
+        """Number of videos released between two dates, inclusive."""
+        params = (day_number(first_day), day_number(last_day))
+        def compute():
+            with self.connection() as conn:
+                return conn.execute(RELEASE_COUNT_SQL, params).fetchone()[0]
+        return self._cached(('count_released',) + params, compute)
+    
+    def release_counts(self, granularity='year'):
+        """Video counts per year ('2023') or month ('2023-07'), oldest first.
+
+        Each period is one range count over idx_videos_release_day.
+        """
+        def compute():
+            with self.connection() as conn:
+                first, last = conn.execute(RELEASE_SPAN_SQL).fetchone()
+                if first is None:
+                    return []
+                counts = []
+                for label, (first_day, last_day) in release_periods(
+                    day_to_date(first), day_to_date(last), granularity
+                ):
+                    params = (day_number(first_day), day_number(last_day))
+                    count = conn.execute(RELEASE_COUNT_SQL, params).fetchone()[0]
+                    if count:
+                        counts.append((label, count))
+                return counts
+        return self._cached(('release_counts', granularity), compute)
+    
+    def similar(self, video_id, limit=10):
+        """Precomputed similar videos (see build_similar.py), most similar first."""
+        return self._fetch(('similar', video_id, limit), SIMILAR_SQL, (video_id, limit))
+    
+    def facets(self):
+        """The in-memory FacetIndex, loaded on first use.
+
+        After another connection commits (an import) the index is refreshed
+        from the video_changes log before it is handed out.
+        """
+        with self._facets_lock:
+            return self._current_facets()
+    
+    def _current_facets(self):
+        # Called with _facets_lock held
+        with self._lock:
+            version = self._read_data_version()
+        if self._facets is None:
+            self._facets = FacetIndex(self.db_path)
+        elif version != self._facets_version:
+            self._facets.refresh()
+        self._facets_version = version
+        return self._facets
+    
+    def browse(self, expression=None, limit=20, after=None, facet_limit=10):
+        """Faceted browsing: one page of matches plus counts for the remaining values.
+
+        expression is a FacetIndex filter such as
+        ('and', ('genre', 'Creampie'), ('or', ('maker', 'S1'), ('maker', 'SOD'))).
+        Pages are keyset pages in listing order, like page(). Returns a dict
+        with videos, next_cursor, total and facets ({kind: [(name, count)]}).
+        """
+        with self._facets_lock:
+            index = self._current_facets()
+            result = index.select(expression) if expression is not None else index.video_ids
+            facets = index.facet_counts(expression, limit=facet_limit)
+        
+        if expression is None:
+            videos, next_cursor = self.page(limit, after)
+            return {'videos': videos, 'next_cursor': next_cursor,
+                    'total': len(result), 'facets': facets}
+        
+        cursor = tuple(after) if after is not None else ()
+        with self.connection() as conn:
+            if len(result) <= BROWSE_ID_LIMIT:
+                sql = IDS_SQL.format(after=f'AND {AFTER_CURSOR}' if cursor else '')
+                params = (json.dumps(list(result)),) + cursor + (limit,)
+            else:
+                # Dense result: few listing rows are skipped before a page fills
+                ids = []
+                listing = LISTING_SQL.format(where=f'WHERE {AFTER_CURSOR}' if cursor else '')
+                for (video_id,) in conn.execute(listing, cursor):
+                    if video_id in result:
+                        ids.append(video_id)
+                        if len(ids) == limit:
+                            break
+                sql = IDS_SQL.format(after='')
+                params = (json.dumps(ids), limit)
+            videos = [summary_to_dict(row) for row in conn.execute(sql, params)]
+        
+        return {
+            'videos': videos,
+            'next_cursor': page_cursor(videos[-1]) if len(videos) == limit else None,
+            'total': len(result),
+            'facets': facets,
+        }
+    
+    def search(self, query, limit=20, offset=0):
+        """Full-text search over codes, titles, descriptions and cast, best match first."""
+        match = build_match_query(query)
+        if not match:
+            return []
+        return self._fetch(('search', match, limit, offset), SEARCH_SQL, (match, limit, offset))
+    
+    def top_categories(self, kind, limit=10):
+        """Most used actresses, genres or makers ('actress', 'genre', 'maker')."""
+        def compute():
+            with self.connection() as conn:
+                return [dict(row) for row in conn.execute(top_categories_sql(kind), (limit,))]
+        return self._cached(('top', kind, limit), compute)